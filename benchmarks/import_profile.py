@@ -0,0 +1,100 @@
+"""
+Cold-start profile for the Streamlit app.
+
+Reports, each in a fresh interpreter:
+- time-to-login-screen: running guru_core.py until the login form is rendered
+- the slowest imports behind the login screen and behind the full app
+
+Usage:
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py --target-ms 1500 --top 20
+"""
+import sys
+import os
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BENCH = os.path.abspath(os.path.dirname(__file__))
+
+LOGIN_IMPORTS = "import guru_db, guru_security, themes, guru_warmup"
+FULL_IMPORTS = (
+    "import guru_db, guru_security, themes, guru_warmup, guru_engine, guru_report, guru_trace; "
+    "from stand_ins import install; install({})"
+)
+
+LOGIN_SCREEN = f"""
+import sys, time
+sys.path[:0] = [{ROOT!r}]
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({os.path.join(ROOT, 'guru_core.py')!r}, default_timeout=120)
+t0 = time.perf_counter()
+at.run()
+elapsed = (time.perf_counter() - t0) * 1000
+assert not at.exception, at.exception
+assert any("Login" in m.value for m in at.markdown), "login form did not render"
+print(f"{{elapsed:.1f}}")
+"""
+
+
+def _run(args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, BENCH]), PYTHONWARNINGS="ignore")
+    return subprocess.run([sys.executable] + args, cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def time_to_login_screen():
+    """Milliseconds for a fresh worker to run guru_core.py up to the login form."""
+    proc = _run(["-c", LOGIN_SCREEN])
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return float(proc.stdout.strip().splitlines()[-1])
+
+
+def import_profile(statement):
+    """
+    Runs `statement` under `python -X importtime` and returns
+    (total_ms, [(module, cumulative_ms), ...]) for top-level imports.
+    """
+    # streamlit is already loaded in a running server, so it is imported first and left out
+    proc = _run(["-X", "importtime", "-c", f"import streamlit; {statement}"])
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    lines = [l for l in proc.stderr.splitlines() if l.startswith("import time:") and "self [us]" not in l]
+    total, modules = 0.0, []
+    for line in lines:
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name, ms = name.strip(), int(cumulative) / 1000
+        if name == "streamlit":
+            total = 0.0
+            modules = []
+            continue
+        # Depth 0 is a module we import, depth 1 its direct dependencies
+        if depth == 0:
+            total += ms
+        if depth <= 1:
+            modules.append((name, ms))
+    return total, sorted(modules, key=lambda x: x[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GuruAi cold-start profile")
+    parser.add_argument("--target-ms", type=float, default=1500.0, help="time-to-login-screen budget")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args(argv)
+
+    for label, statement in [("login screen", LOGIN_IMPORTS), ("full app", FULL_IMPORTS)]:
+        total, modules = import_profile(statement)
+        print(f"\n{label} imports: {total:.0f} ms")
+        for name, ms in modules[:args.top]:
+            print(f"  {name:<45} {ms:>8.1f} ms")
+
+    login_ms = time_to_login_screen()
+    status = "OK" if login_ms <= args.target_ms else "OVER TARGET"
+    print(f"\ntime-to-login-screen: {login_ms:.0f} ms (target {args.target_ms:.0f} ms) {status}")
+    return 0 if login_ms <= args.target_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
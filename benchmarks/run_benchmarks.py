@@ -0,0 +1,275 @@
+"""
+Offline end-to-end benchmark for GuruAi.
+
+Drives the real DataEngine, build_agent_graph, guru_db and generate_pdf code
+paths against local stand-ins (see stand_ins.py) and reports latency,
+throughput and peak memory per stage.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 1000 1000000 10000000 --turns 200
+    python benchmarks/run_benchmarks.py --check benchmarks/thresholds.json
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from io import BytesIO
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import numpy as np
+import pandas as pd
+from stand_ins import install
+
+PROMPT_TOP = "top 5 regions by revenue"
+PROMPT_WIDE = "summarize the widest columns"
+PROMPT_CHAT = "what drives units sold?"
+
+PLAN = {
+    PROMPT_TOP: [
+        [("python_analysis", {"code": "print(df.groupby('region')['revenue'].sum().nlargest(5))"})],
+        [("python_analysis", {"code": "df.groupby('region')['revenue'].sum().plot(kind='bar')"})],
+    ],
+    PROMPT_WIDE: [
+        [("python_analysis", {"code": "print(df.describe().T.head(10))"})],
+        [("python_analysis", {"code": "print(df.iloc[:, :10].corr().round(2))"})],
+    ],
+    PROMPT_CHAT: [
+        [
+            ("tavily_search_results_json", {"query": "what drives units sold"}),
+            ("python_analysis", {"code": "print(df[['units', 'revenue']].corr())"}),
+        ],
+    ],
+}
+
+
+# --- DATA GENERATION ---
+
+def make_sales_csv(rows, seed=0):
+    """Deterministic sales table encoded as CSV bytes."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=rows, freq="min").astype(str),
+        "region": rng.choice(["North", "South", "East", "West", "APAC", "EMEA", "LATAM", "ANZ"], rows),
+        "product": rng.choice([f"SKU-{i}" for i in range(50)], rows),
+        "units": rng.integers(1, 100, rows),
+        "revenue": rng.gamma(2.0, 50.0, rows).round(2),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def make_wide_csv(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(rows, cols)), columns=[f"m{i}" for i in range(cols)])
+    return df.round(4).to_csv(index=False).encode("utf-8")
+
+
+def as_upload(raw_bytes, name):
+    upload = BytesIO(raw_bytes)
+    upload.name = name
+    return upload
+
+
+# --- MEASUREMENT ---
+
+class Recorder:
+    """Collects per-stage samples of latency and peak traced memory."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def measure(self, scenario, stage, fn, units=None):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - t0) * 1000
+        peak = (tracemalloc.get_traced_memory()[1] - base) / 1e6
+        self.add(scenario, stage, elapsed, peak, units)
+        return result
+
+    def add(self, scenario, stage, ms, peak_mb=0.0, units=None):
+        self.samples.setdefault((scenario, stage), []).append((ms, peak_mb, units))
+
+    def add_spans(self, scenario, spans):
+        # Break an agent turn down into llm / tool / db / render time
+        totals = {}
+        for s in spans:
+            if s["parent_id"] is None:
+                totals[s["stage"]] = totals.get(s["stage"], 0.0) + s["duration_ms"]
+        for stage, ms in totals.items():
+            self.add(scenario, f"turn.{stage}", ms)
+
+    def report(self):
+        rows = []
+        for (scenario, stage), samples in self.samples.items():
+            ms = np.array([s[0] for s in samples])
+            units = [s[2] for s in samples if s[2]]
+            rows.append({
+                "key": f"{scenario}/{stage}",
+                "n": len(samples),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "peak_mb": max(s[1] for s in samples),
+                "throughput": (sum(units) / (ms.sum() / 1000)) if units and ms.sum() > 0 else None,
+            })
+        return rows
+
+
+# --- SCENARIOS ---
+
+def run_turn(app, prompt):
+    from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+    from guru_trace import start_trace
+
+    messages = [SystemMessage(content="You are GuruAi."), HumanMessage(content=prompt)]
+    final = ""
+    with start_trace("bench") as trace:
+        for event in app.stream({"messages": messages}, config={"recursion_limit": 60}, stream_mode="values"):
+            msg = event["messages"][-1]
+            if isinstance(msg, AIMessage) and msg.content and not msg.tool_calls:
+                final = msg.content
+    return final, trace
+
+
+def render_chart(engine, path):
+    if engine.latest_figure:
+        engine.latest_figure.savefig(path)
+        engine.latest_figure = None
+
+
+def scenario_dataset(rec, rows):
+    from guru_engine import DataEngine
+    from guru_brain import build_agent_graph
+
+    name = f"dataset-{rows}"
+    raw = make_sales_csv(rows)
+
+    engine = DataEngine()
+    rec.measure(name, "parse", lambda: engine.load_file(as_upload(raw, "sales.csv")), units=rows)
+    other = DataEngine()
+    rec.measure(name, "load_shared", lambda: other.load_file(as_upload(raw, "sales.csv")), units=rows)
+
+    app = build_agent_graph(engine)
+    _, trace = rec.measure(name, "turn", lambda: run_turn(app, PROMPT_TOP))
+    rec.add_spans(name, trace.spans)
+    rec.measure(name, "render", lambda: render_chart(engine, f"chart_{name}.png"))
+
+
+def scenario_wide(rec, rows, cols):
+    from guru_engine import DataEngine
+    from guru_brain import build_agent_graph
+
+    name = f"wide-{rows}x{cols}"
+    raw = make_wide_csv(rows, cols)
+
+    engine = DataEngine()
+    rec.measure(name, "parse", lambda: engine.load_file(as_upload(raw, "wide.csv")), units=rows * cols)
+    app = build_agent_graph(engine)
+    _, trace = rec.measure(name, "turn", lambda: run_turn(app, PROMPT_WIDE))
+    rec.add_spans(name, trace.spans)
+
+
+def scenario_session(rec, turns, rows):
+    from guru_engine import DataEngine
+    from guru_brain import build_agent_graph
+    from guru_db import save_message, load_history
+    from guru_report import generate_pdf
+
+    name = f"session-{turns}"
+    session_id = "bench-Session-long"
+    engine = DataEngine()
+    engine.load_file(as_upload(make_sales_csv(rows, seed=1), "sales.csv"))
+    app = build_agent_graph(engine)
+
+    for i in range(turns):
+        prompt = [PROMPT_TOP, PROMPT_CHAT][i % 2]
+        rec.measure(name, "db.save", lambda: save_message(session_id, "user", prompt))
+        history = rec.measure(name, "db.load", lambda: load_history(session_id), units=2 * i + 1)
+        answer, trace = rec.measure(name, "turn", lambda: run_turn(app, prompt))
+        rec.add_spans(name, trace.spans)
+        render_chart(engine, f"chart_{session_id}.png")
+        save_message(session_id, "assistant", answer)
+
+    history = load_history(session_id)
+    rec.measure(name, "pdf", lambda: generate_pdf(history, session_id), units=len(history))
+
+
+# --- ENTRY POINT ---
+
+def run_suite(sizes=(1_000, 100_000, 1_000_000), wide_cols=500, turns=50, session_rows=10_000, monkeypatch=None):
+    """Runs every scenario and returns the report rows."""
+    install(PLAN, monkeypatch=monkeypatch)
+    rec = Recorder()
+    tracemalloc.start()
+    try:
+        for rows in sizes:
+            scenario_dataset(rec, rows)
+        if wide_cols:
+            scenario_wide(rec, 1_000, wide_cols)
+        if turns:
+            scenario_session(rec, turns, session_rows)
+    finally:
+        tracemalloc.stop()
+    return rec.report()
+
+
+def check_thresholds(rows, thresholds):
+    """Returns a list of human-readable regressions."""
+    failures = []
+    by_key = {r["key"]: r for r in rows}
+    for key, limits in thresholds.items():
+        row = by_key.get(key)
+        if row is None:
+            continue
+        for metric, limit in limits.items():
+            if row[metric] is not None and row[metric] > limit:
+                failures.append(f"{key}: {metric}={row[metric]:.1f} exceeds {limit}")
+    return failures
+
+
+def print_report(rows):
+    print(f"{'stage':<38} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'peak MB':>9} {'units/s':>12}")
+    for r in rows:
+        tput = f"{r['throughput']:>12.0f}" if r["throughput"] else f"{'-':>12}"
+        print(f"{r['key']:<38} {r['n']:>4} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['peak_mb']:>9.1f} {tput}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GuruAi offline benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--wide-cols", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--check", help="JSON file of per-stage regression thresholds")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    check_path = os.path.abspath(args.check) if args.check else None
+    out_path = os.path.abspath(args.out) if args.out else None
+
+    # Charts, PDFs and traces land in a scratch directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.environ.setdefault("GURU_TRACE_FILE", os.path.join(workdir, "traces.jsonl"))
+        rows = run_suite(args.sizes, args.wide_cols, args.turns)
+
+    print_report(rows)
+    if out_path:
+        with open(out_path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    if check_path:
+        with open(check_path) as f:
+            failures = check_thresholds(rows, json.load(f))
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Offline stand-ins for the network services GuruAi talks to.
+
+- ScriptedChatModel: deterministic replacement for ChatGroq that emits tool calls
+- fake_search_results: replacement for TavilySearchResults
+- SQLiteClient: in-memory replacement for the Supabase client
+
+`install()` wires all three into the real guru_* modules so the benchmark
+drives build_agent_graph / DataEngine / guru_db / generate_pdf unchanged.
+"""
+import sys
+import os
+import time
+import json
+import sqlite3
+import threading
+import itertools
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+
+
+# --- SCRIPTED LLM ---
+
+class ScriptedChatModel:
+    """
+    Replays a fixed plan instead of calling Groq.
+    `plan` maps a prompt to a list of hops; each hop is a list of tool calls
+    given as (tool_name, args). Once the hops are used up the model answers.
+    `latency` is seconds per call, or a {model_name: seconds} dict.
+    """
+
+    def __init__(self, plan, latency=0.0, **kwargs):
+        self.plan = plan
+        self.model = kwargs.get("model", "scripted")
+        self.latency = latency.get(self.model, 0.0) if isinstance(latency, dict) else latency
+        self._ids = itertools.count()
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def stream(self, messages, *args, **kwargs):
+        message = self.invoke(messages)
+        yield AIMessageChunk(
+            content=message.content,
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        )
+
+    def invoke(self, messages, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+
+        # Find the current turn: everything after the last human message
+        start = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+        prompt = messages[start].content
+        turn = messages[start + 1:]
+        hop = sum(1 for m in turn if isinstance(m, AIMessage) and m.tool_calls)
+        steps = self.plan.get(prompt, [])
+
+        usage = {
+            "input_tokens": sum(len(str(m.content)) // 4 for m in messages),
+            "output_tokens": 0,
+            "total_tokens": 0,
+        }
+
+        if hop < len(steps):
+            calls = [
+                {"name": name, "args": args, "id": f"call_{next(self._ids)}", "type": "tool_call"}
+                for name, args in steps[hop]
+            ]
+            usage["output_tokens"] = sum(len(json.dumps(c["args"])) // 4 for c in calls)
+            usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+            return AIMessage(content="", tool_calls=calls, usage_metadata=usage)
+
+        results = [m.content for m in turn if isinstance(m, ToolMessage)]
+        answer = f"Summary of {len(results)} tool result(s) for: {prompt}"
+        usage["output_tokens"] = len(answer) // 4
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=answer, usage_metadata=usage)
+
+
+# --- FAKE SEARCH ---
+
+class SearchInput(BaseModel):
+    query: str = Field(description="search query to look up")
+
+
+def fake_search_results(max_results=2, latency=0.0, **kwargs):
+    """Deterministic stand-in for TavilySearchResults with the same tool name."""
+
+    def search(query: str):
+        if latency:
+            time.sleep(latency)
+        return [
+            {"url": f"https://example.com/{i}", "content": f"Result {i} for '{query}'."}
+            for i in range(max_results)
+        ]
+
+    return StructuredTool.from_function(
+        func=search,
+        name="tavily_search_results_json",
+        description="A search engine. Input should be a search query.",
+        args_schema=SearchInput,
+    )
+
+
+# --- SQLITE STAND-IN FOR SUPABASE ---
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """Implements the slice of the supabase-py query builder that guru_db uses."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.filters = []
+        self.ordering = None
+        self.max_rows = None
+        self.payload = None
+
+    def select(self, columns="*", count=None):
+        self.action, self.columns = "select", columns
+        return self
+
+    def insert(self, data):
+        self.action, self.payload = "insert", data
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class SQLiteClient:
+    """In-memory SQLite database exposing a Supabase-like `table()` API."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT, role TEXT, content TEXT, username TEXT,
+            created_at INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT, password_hash TEXT, created_at INTEGER
+        );
+    """
+
+    def __init__(self, path=":memory:", latency=0.0):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._clock = itertools.count()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def _execute(self, q):
+        if self.latency:
+            time.sleep(self.latency)
+
+        where = " AND ".join(f"{col} = ?" for col, _ in q.filters)
+        where = f" WHERE {where}" if where else ""
+        params = [v for _, v in q.filters]
+
+        with self._lock:
+            if q.action == "insert":
+                rows = q.payload if isinstance(q.payload, list) else [q.payload]
+                for row in rows:
+                    row = dict(row, created_at=next(self._clock))
+                    cols = ", ".join(row)
+                    marks = ", ".join("?" for _ in row)
+                    self.conn.execute(f"INSERT INTO {q.table} ({cols}) VALUES ({marks})", list(row.values()))
+                self.conn.commit()
+                return _Result(rows)
+
+            if q.action == "delete":
+                self.conn.execute(f"DELETE FROM {q.table}{where}", params)
+                self.conn.commit()
+                return _Result([])
+
+            sql = f"SELECT {q.columns} FROM {q.table}{where}"
+            if q.ordering:
+                sql += f" ORDER BY {q.ordering[0]} {'DESC' if q.ordering[1] else 'ASC'}"
+            if q.max_rows is not None:
+                sql += f" LIMIT {int(q.max_rows)}"
+            return _Result([dict(r) for r in self.conn.execute(sql, params)])
+
+
+# --- WIRING ---
+
+def install(plan, llm_latency=0.0, search_latency=0.0, db_latency=0.0, monkeypatch=None):
+    """
+    Points the guru_* modules at the local stand-ins.
+    Pass pytest's `monkeypatch` to have everything undone after the test;
+    without it the patches last for the rest of the process (benchmark runs).
+    Returns the SQLite client so callers can inspect stored rows.
+    """
+    import streamlit as st
+    patch = monkeypatch.setattr if monkeypatch is not None else setattr
+
+    # guru_brain halts at import time without keys, so provide dummies first
+    patch(st, "secrets", {
+        "GROQ_API_KEYS": "bench-key-1,bench-key-2",
+        "TAVILY_API_KEYS": "bench-search-key",
+        "SUPABASE_URL": "https://bench.local",
+        "SUPABASE_KEY": "bench",
+    })
+
+    import guru_brain
+    import guru_db
+
+    client = SQLiteClient(latency=db_latency)
+    patch(guru_brain, "ChatGroq", lambda **kw: ScriptedChatModel(plan, latency=llm_latency, **kw))
+    patch(guru_brain, "TavilySearchResults", lambda **kw: fake_search_results(latency=search_latency, **kw))
+    patch(guru_db, "get_supabase_client", lambda: client)
+    return client
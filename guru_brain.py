@@ -1,20 +1,43 @@
 import streamlit as st
 import os
+import json
+import time
 import operator
+import threading
+import contextvars
+import httpx
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import TypedDict, Annotated, Sequence
 from langchain_groq import ChatGroq
 from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage, message_chunk_to_message
 from langchain_core.tools import StructuredTool
 from langgraph.graph import StateGraph, START
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from pydantic import BaseModel, Field
+from guru_trace import span
+from guru_hedge import get_hedge_policy
 
 # --- CONFIGURATION ---
 # We prioritize the 70b model for logic, but fallback to 8b if needed
 MODEL_SMART = "llama-3.3-70b-versatile"
 MODEL_FAST = "meta-llama/llama-4-maverick-17b-128e-instruct"
 
+# Tools that never touch DataEngine.scope can run side by side.
+# Everything else (python_analysis) runs one call at a time, in call order.
+READ_ONLY_TOOLS = {"tavily_search_results_json"}
+TOOL_WORKERS = 4
+
+# LLM calls run here so a slow primary can be raced by the fallback model.
+# Hedges get their own small pool and never queue: with no free slot we skip the hedge
+# rather than add load while Groq is already slow.
+LLM_WORKERS = 16
+HEDGE_WORKERS = 4
+LLM_TIMEOUT_SECONDS = 30  # per read, so a request stuck before its first token gives up
+_llm_pool = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="guru-llm")
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="guru-hedge")
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
 # Load Keys
 raw_groq = st.secrets.get("GROQ_API_KEYS", "")
 raw_tavily = st.secrets.get("TAVILY_API_KEYS", "")
@@ -74,51 +97,252 @@ def get_tools(data_engine):
     return [search, python_tool]
 
 
-# --- AGENT GRAPH ---
-class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
-
+# --- TOOL EXECUTOR ---
+def _tool_output(result):
+    if isinstance(result, str):
+        return result
+    try:
+        return json.dumps(result, ensure_ascii=False, default=str)
+    except Exception:
+        return str(result)
+
+
+def _run_tool(tools_by_name, call):
+    with span("tool", call["name"]):
+        tool = tools_by_name.get(call["name"])
+        if tool is None:
+            return f"❌ Tool Error: unknown tool '{call['name']}'.", "error"
+        try:
+            return _tool_output(tool.invoke(call["args"])), "success"
+        except Exception as e:
+            return f"❌ Tool Error: {str(e)}", "error"
+
+
+def execute_tool_calls(tool_calls, tools):
+    """
+    Runs one hop of tool calls and returns ToolMessages in call order.
+    Identical calls run once, read-only tools run concurrently, and tools
+    that mutate DataEngine.scope run serially on the calling thread.
+    """
+    tools_by_name = {t.name: t for t in tools}
+
+    # Dedupe identical invocations (the old "Double Code" bug)
+    unique = {}
+    for call in tool_calls:
+        signature = (call["name"], json.dumps(call["args"], sort_keys=True, default=str))
+        unique.setdefault(signature, call)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=TOOL_WORKERS) as pool:
+        futures = {
+            sig: pool.submit(contextvars.copy_context().run, _run_tool, tools_by_name, call)
+            for sig, call in unique.items() if call["name"] in READ_ONLY_TOOLS
+        }
+        for sig, call in unique.items():
+            if sig not in futures:
+                results[sig] = _run_tool(tools_by_name, call)
+        for sig, future in futures.items():
+            results[sig] = future.result()
+
+    messages = []
+    for call in tool_calls:
+        signature = (call["name"], json.dumps(call["args"], sort_keys=True, default=str))
+        content, status = results[signature]
+        messages.append(ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], status=status))
+    return messages
+
+
+# --- HEDGED LLM CALLS ---
+class _CallCancelled(Exception):
+    pass
+
+
+def _is_rate_limit(error):
+    return "429" in str(error) or "Rate limit" in str(error)
+
+
+class _ModelCall:
+    """One streaming LLM request running on the pool."""
+
+    def __init__(self, model_name, key_index, hedge, retries):
+        self.model_name = model_name
+        self.key_index = key_index
+        self.hedge = hedge
+        self.retries = retries
+        self.started = threading.Event()   # picked up by a pool worker
+        self.progress = threading.Event()  # first token arrived, or the call finished
+        self.cancel = threading.Event()
+        self.future = None
+        self._http_client = None
+
+    def run(self, tools, messages, policy):
+        self.started.set()
+        # Our own connection, so cancel() can abort a request still waiting for its first token
+        self._http_client = httpx.Client(timeout=LLM_TIMEOUT_SECONDS)
+        llm = ChatGroq(
+            model=self.model_name,
+            temperature=0.0,
+            api_key=GROQ_KEYS[self.key_index],
+            timeout=LLM_TIMEOUT_SECONDS,
+            http_client=self._http_client
+        ).bind_tools(tools, parallel_tool_calls=True)
+
+        with span("llm", self.model_name, key_index=self.key_index, retries=self.retries, hedge=self.hedge) as attrs:
+            try:
+                if self.cancel.is_set():
+                    raise _CallCancelled()
+                t0 = time.perf_counter()
+                message = None
+                for chunk in llm.stream(messages):
+                    if message is None:
+                        first_token = time.perf_counter() - t0
+                        attrs["first_token_ms"] = round(first_token * 1000, 1)
+                        policy.record_latency(self.model_name, first_token)
+                        self.progress.set()
+                    if self.cancel.is_set():
+                        raise _CallCancelled()
+                    message = chunk if message is None else message + chunk
+            except Exception:
+                if self.cancel.is_set():
+                    attrs["cancelled"] = True
+                    raise _CallCancelled()
+                raise
+            finally:
+                self.progress.set()
+                self._http_client.close()
+
+            response = message_chunk_to_message(message) if message is not None else AIMessage(content="")
+            usage = getattr(response, "usage_metadata", None) or {}
+            attrs["input_tokens"] = usage.get("input_tokens", 0)
+            attrs["output_tokens"] = usage.get("output_tokens", 0)
+            return response
+
+    def start(self, tools, messages, policy, pool=None):
+        pool = pool or _llm_pool
+        self.future = pool.submit(contextvars.copy_context().run, self.run, tools, messages, policy)
+        return self
+
+    def stop(self):
+        """Cancels the call, closing its connection if the request is in flight."""
+        self.cancel.set()
+        if self._http_client is not None:
+            self._http_client.close()
+
+
+def hedged_invoke(tools, messages):
+    """
+    Calls MODEL_SMART; if it has not produced a first token within the
+    policy deadline, races MODEL_FAST on the next key and keeps whichever
+    finishes first. A primary that fails outright falls back to MODEL_FAST.
+    """
+    policy = get_hedge_policy()
+    primary_key = st.session_state.groq_idx % len(GROQ_KEYS)
+    primary = _ModelCall(MODEL_SMART, primary_key, hedge=False, retries=0).start(tools, messages, policy)
+    running = [primary]
+    raced = False
+    fallback_started = False
+
+    # Time spent queued for a worker does not count against the deadline
+    deadline = policy.deadline(MODEL_SMART)
+    primary.started.wait()
+    if not primary.progress.wait(deadline) and _hedge_slots.acquire(blocking=False):
+        # Slow but not failing: fire the fallback on another key in parallel
+        policy.record_hedge()
+        fallback_key = (primary_key + 1) % len(GROQ_KEYS)
+        hedge = _ModelCall(MODEL_FAST, fallback_key, hedge=True, retries=1).start(tools, messages, policy, _hedge_pool)
+        hedge.future.add_done_callback(lambda _: _hedge_slots.release())
+        running.append(hedge)
+        raced = fallback_started = True
+
+    last_error = None
+    while running:
+        done, _ = wait([c.future for c in running], return_when=FIRST_COMPLETED)
+        for call in [c for c in running if c.future in done]:
+            running.remove(call)
+            try:
+                response = call.future.result()
+            except Exception as e:
+                last_error = e
+                # If it's a Rate Limit (429), rotate key before the next attempt
+                if _is_rate_limit(e):
+                    rotate_groq_key()
+                # If the primary failed before any hedge, try the FAST model
+                if not fallback_started:
+                    key_index = st.session_state.groq_idx % len(GROQ_KEYS)
+                    running.append(_ModelCall(MODEL_FAST, key_index, hedge=False, retries=1).start(tools, messages, policy))
+                    fallback_started = True
+                continue
 
-def build_agent_graph(data_engine):
-    init_keys()
+            for other in running:
+                other.stop()
+            if raced:
+                policy.record_race(hedge_won=call.hedge)
+            return response
 
-    def agent_node(state):
-        # Try SMART model first, then FAST model
-        models_to_try = [MODEL_SMART, MODEL_FAST]
+    raise last_error
 
-        last_error = None
 
-        for model_name in models_to_try:
-            try:
-                tools = get_tools(data_engine)
-                key = os.environ["GROQ_API_KEY"]
+# --- DIRECT ANSWERS (router fast paths) ---
+def fast_answer(messages):
+    """Answers with MODEL_FAST and no tools bound, rotating keys on 429."""
+    init_keys()
+    last_error = None
+    for attempt in range(len(GROQ_KEYS)):
+        key_index = st.session_state.groq_idx % len(GROQ_KEYS)
+        try:
+            llm = ChatGroq(model=MODEL_FAST, temperature=0.0, api_key=GROQ_KEYS[key_index])
+            with span("llm", MODEL_FAST, key_index=key_index, retries=attempt, tools=False) as attrs:
+                response = llm.invoke(messages)
+                usage = getattr(response, "usage_metadata", None) or {}
+                attrs["input_tokens"] = usage.get("input_tokens", 0)
+                attrs["output_tokens"] = usage.get("output_tokens", 0)
+            return response
+        except Exception as e:
+            last_error = e
+            if not _is_rate_limit(e):
+                break
+            rotate_groq_key()
+    raise last_error
+
+
+def search_answer(messages, query):
+    """Runs one web search and lets MODEL_FAST summarize the results."""
+    init_keys()
+    search = TavilySearchResults(max_results=2)
+    with span("tool", search.name):
+        results = _tool_output(search.invoke({"query": query}))
+    context = SystemMessage(content=f"Web search results for '{query}':\n{results}\nCite the URLs you use.")
+    return fast_answer(list(messages[:-1]) + [context, messages[-1]])
 
-                # CRITICAL: parallel_tool_calls=False prevents the "Double Code" bug
-                llm = ChatGroq(
-                    model=model_name,
-                    temperature=0.0,
-                    api_key=key
-                ).bind_tools(tools, parallel_tool_calls=False)
 
-                response = llm.invoke(state["messages"])
-                return {"messages": [response]}
+# --- AGENT GRAPH ---
+class AgentState(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], operator.add]
 
-            except Exception as e:
-                # If it's a Rate Limit (429), rotate key and retry SAME model
-                if "429" in str(e) or "Rate limit" in str(e):
-                    rotate_groq_key()
-                    continue
 
-                    # If it's a Model Overload (503/500), try NEXT model
-                last_error = e
-                continue
+def build_agent_graph(data_engine):
+    init_keys()
 
-        # If all fail
-        return {"messages": [AIMessage(content=f"❌ System Busy. Error: {str(last_error)}")]}
+    def agent_node(state):
+        try:
+            # Parallel calls are safe: execute_tool_calls dedupes and serializes python_analysis
+            tools = get_tools(data_engine)
+            response = hedged_invoke(tools, state["messages"])
+            return {"messages": [response]}
+        except Exception as e:
+            # If all fail
+            return {"messages": [AIMessage(content=f"❌ System Busy. Error: {str(e)}")]}
 
     workflow = StateGraph(AgentState)
     workflow.add_node("agent", agent_node)
-    workflow.add_node("tools", ToolNode(get_tools(data_engine)))
+    tools = get_tools(data_engine)
+
+    def tools_node(state):
+        tool_calls = state["messages"][-1].tool_calls
+        with span("tool", "tools", calls=[t["name"] for t in tool_calls]):
+            return {"messages": execute_tool_calls(tool_calls, tools)}
+
+    workflow.add_node("tools", tools_node)
 
     workflow.add_edge(START, "agent")
     workflow.add_conditional_edges("agent", tools_condition)
@@ -0,0 +1,188 @@
+import streamlit as st
+import numpy as np
+import re
+import time
+import zlib
+import threading
+
+# --- CONFIGURATION ---
+ANSWER_CACHE_TTL = float(st.secrets.get("ANSWER_CACHE_TTL_SECONDS", 24 * 3600))
+# hashing | sentence-transformers | auto. The model embedders import torch (and may
+# download weights) on first use, so they are opt-in and pre-warmed after login.
+ANSWER_CACHE_EMBEDDER = st.secrets.get("ANSWER_CACHE_EMBEDDER", "hashing")
+# "user" keeps answers private, "org" shares them between everyone on the same dataset
+# (opt in once the false-hit rate has been measured for your prompts)
+ANSWER_CACHE_SCOPE = st.secrets.get("ANSWER_CACHE_SCOPE", "user")
+ORG_ID = st.secrets.get("ORG_ID", "default")
+MAX_ENTRIES_PER_SCOPE = 500
+
+
+# --- EMBEDDERS ---
+class HashingEmbedder:
+    """
+    Offline embedder: hashed word and character-trigram counts.
+    Catches rephrasings that share vocabulary; no model download needed.
+    """
+    name = "hashing"
+    threshold = 0.85
+
+    def __init__(self, dims=1024):
+        self.dims = dims
+
+    def embed(self, text):
+        vec = np.zeros(self.dims, dtype=np.float32)
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        for word in words:
+            vec[zlib.crc32(word.encode()) % self.dims] += 2.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vec[zlib.crc32(padded[i:i + 3].encode()) % self.dims] += 1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+class SentenceTransformerEmbedder:
+    """Semantic embedder backed by sentence-transformers (already in requirements)."""
+    name = "sentence-transformers"
+    threshold = 0.88
+
+    def __init__(self, model_name="all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def embed(self, text):
+        return self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+def make_embedder(kind=None):
+    """Builds the configured embedder, falling back to hashing when the model is unavailable."""
+    kind = kind or ANSWER_CACHE_EMBEDDER
+    if kind in ("auto", "sentence-transformers"):
+        try:
+            return SentenceTransformerEmbedder()
+        except Exception:
+            if kind == "sentence-transformers":
+                raise
+    return HashingEmbedder()
+
+
+# --- CACHE ---
+# Prompts that lean on the previous turn ("now plot it", "same for 2023") have
+# no standalone meaning, so they are never looked up or stored
+FOLLOW_UP_PATTERNS = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|above|previous|previously|earlier|last one|same|"
+    r"again|instead|also|too|now|then|more|another|else)\b|^\s*(and|but|what about|how about|ok|okay|yes|sure)\b",
+    re.IGNORECASE,
+)
+
+
+def depends_on_context(prompt, has_history):
+    """True when the answer may depend on earlier turns of the conversation."""
+    return has_history and bool(FOLLOW_UP_PATTERNS.search(prompt))
+
+
+# Words that flip an answer while barely changing the embedding ("highest" vs
+# "lowest", "> 100" vs "< 100", bar vs line chart). Each maps to a canonical term.
+INTENT_TERMS = [
+    ("max", r"\b(highest|most|max|maximum|largest|biggest|best|greatest|top|more)\b"),
+    ("min", r"\b(lowest|least|min|minimum|smallest|fewest|worst|bottom|less|fewer)\b"),
+    ("asc", r"\b(ascending|asc|increasing)\b"),
+    ("desc", r"\b(descending|desc|decreasing)\b"),
+    (">=", r">=|\bat least\b"),
+    ("<=", r"<=|\bat most\b"),
+    ("!=", r"!=|\bnot equal"),
+    ("==", r"==|\bequals?\b|\bequal to\b"),
+    (">", r">(?!=)|\b(greater|more|higher) than\b|\b(above|over|exceeds?)\b"),
+    ("<", r"<(?!=)|\b(less|fewer|lower) than\b|\b(below|under)\b"),
+    ("not", r"\b(not|no|without|except|excluding)\b"),
+]
+CHART_TERMS = re.compile(r"\b(bar|line|pie|scatter|histogram|hist|box|heatmap|area|violin|donut|bubble)\b")
+
+
+def key_terms(prompt, columns=()):
+    """
+    Numbers, column names, comparison or direction words and chart types
+    in a prompt. Two prompts can only share an answer when these match
+    exactly ("top 5" is never served "top 10", "highest" never "lowest").
+    """
+    lowered = prompt.lower()
+    numbers = set(re.findall(r"\d+(?:\.\d+)?", lowered))
+    mentioned = {str(c).lower() for c in columns if str(c).lower() in lowered}
+    intents = {f"intent:{term}" for term, pattern in INTENT_TERMS if re.search(pattern, lowered)}
+    charts = {f"chart:{kind}" for kind in CHART_TERMS.findall(lowered)}
+    return frozenset(numbers | mentioned | intents | charts)
+
+
+class CachedAnswer:
+    def __init__(self, prompt, answer, charts, embedding, terms):
+        self.prompt = prompt
+        self.answer = answer
+        self.charts = charts  # list of PNG bytes
+        self.embedding = embedding
+        self.terms = terms
+        self.created = time.time()
+        self.hits = 0
+
+
+class AnswerCache:
+    """
+    Semantic answer cache, scoped by (user or org, dataset content hash).
+    A lookup hits when a fresh entry's prompt embedding is within the
+    embedder's cosine-similarity threshold.
+    """
+
+    def __init__(self, embedder, ttl=None, threshold=None):
+        self.embedder = embedder
+        self.ttl = ANSWER_CACHE_TTL if ttl is None else ttl
+        self.threshold = embedder.threshold if threshold is None else threshold
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _live(self, scope):
+        # Drop expired entries for this scope
+        now = time.time()
+        entries = [e for e in self._entries.get(scope, []) if now - e.created < self.ttl]
+        self._entries[scope] = entries
+        return entries
+
+    def lookup(self, scope, prompt, columns=()):
+        """Returns (CachedAnswer, similarity) or (None, best_similarity)."""
+        query = self.embedder.embed(prompt)
+        terms = key_terms(prompt, columns)
+        with self._lock:
+            entries = [e for e in self._live(scope) if e.terms == terms]
+            if not entries:
+                return None, 0.0
+            scores = np.stack([e.embedding for e in entries]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None, float(scores[best])
+            entries[best].hits += 1
+            return entries[best], float(scores[best])
+
+    def store(self, scope, prompt, answer, charts=(), columns=()):
+        entry = CachedAnswer(prompt, answer, list(charts), self.embedder.embed(prompt), key_terms(prompt, columns))
+        with self._lock:
+            entries = self._live(scope)
+            entries.append(entry)
+            if len(entries) > MAX_ENTRIES_PER_SCOPE:
+                del entries[0]
+        return entry
+
+
+def cache_scope(username, dataset_digest):
+    """Cache partition for a user's current dataset."""
+    owner = ORG_ID if ANSWER_CACHE_SCOPE == "org" else f"user:{username}"
+    return owner, dataset_digest
+
+
+@st.cache_resource
+def get_answer_cache() -> AnswerCache:
+    """One cache per worker process, shared by all sessions."""
+    return AnswerCache(make_embedder())
+
+
+def prewarm_embedder():
+    """Loads a model embedder in the background so no chat turn pays for it."""
+    if ANSWER_CACHE_EMBEDDER != "hashing":
+        threading.Thread(target=get_answer_cache, name="guru-embedder-prewarm", daemon=True).start()
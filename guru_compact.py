@@ -0,0 +1,86 @@
+import os
+import re
+
+# --- CONFIGURATION ---
+# Max tokens of python_analysis output that go back into the LLM context
+TOOL_OUTPUT_TOKEN_BUDGET = int(os.environ.get("GURU_TOOL_OUTPUT_TOKENS", 1500))
+TABLE_MIN_LINES = 12   # shorter tables are kept whole
+TABLE_KEEP = 5         # head/tail rows kept from a long table
+REPEAT_MIN_LINES = 8   # longer runs of same-shaped lines get collapsed
+
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)*(?:e[+-]?\d+)?", re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) without a tokenizer dependency."""
+    return (len(text) + 3) // 4
+
+
+def _template(line):
+    # Lines that only differ in their numbers share a template
+    return _NUMBER.sub("#", line.strip())
+
+
+def _width(line):
+    return len(line.split())
+
+
+def _collapse_repeats(lines):
+    """Collapses runs of identical or same-template lines (e.g. prints in a loop)."""
+    out, i = [], 0
+    while i < len(lines):
+        j = i + 1
+        while j < len(lines) and _template(lines[j]) == _template(lines[i]) and lines[i].strip():
+            j += 1
+        run = j - i
+        if run > REPEAT_MIN_LINES:
+            out += lines[i:i + 2]
+            out.append(f"... [{run - 3} similar lines omitted] ...")
+            out.append(lines[j - 1])
+        else:
+            out += lines[i:j]
+        i = j
+    return out
+
+
+def _shorten_tables(lines):
+    """Keeps the head and tail of long tabular blocks plus their row count."""
+    out, i = [], 0
+    while i < len(lines):
+        width = _width(lines[i])
+        j = i + 1
+        # A table is a run of lines with the same number of fields
+        while width >= 2 and j < len(lines) and _width(lines[j]) == width:
+            j += 1
+        rows = lines[i:j]
+        if len(rows) >= TABLE_MIN_LINES:
+            out += rows[:TABLE_KEEP]
+            out.append(f"... [table: {len(rows)} rows x {width} fields, {len(rows) - 2 * TABLE_KEEP} omitted] ...")
+            out += rows[-TABLE_KEEP:]
+        else:
+            out += rows
+        i = j
+    return out
+
+
+def _truncate(text, budget):
+    max_chars = budget * 4
+    if len(text) <= max_chars:
+        return text
+    head = text[:int(max_chars * 0.6)]
+    tail = text[-int(max_chars * 0.3):]
+    return f"{head}\n... [{len(text) - len(head) - len(tail)} characters omitted] ...\n{tail}"
+
+
+def compact_output(text, budget=None):
+    """
+    Shrinks tool output to fit `budget` tokens.
+    Returns (compacted_text, was_compacted).
+    """
+    budget = budget or TOOL_OUTPUT_TOKEN_BUDGET
+    if estimate_tokens(text) <= budget:
+        return text, False
+
+    lines = _collapse_repeats(_shorten_tables(text.splitlines()))
+    compacted = _truncate("\n".join(lines), budget)
+    return compacted, True
@@ -1,30 +1,42 @@
 import streamlit as st
 import uuid
-import matplotlib.pyplot as plt
 import os
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import time
 
-# --- CUSTOM MODULES ---
+# --- LIGHTWEIGHT MODULES (needed for the login screen) ---
 from guru_db import init_db, save_message, load_history, clear_session, get_all_sessions, save_setting, load_setting
 from themes import THEMES, inject_theme_css
-from guru_engine import DataEngine
-from guru_brain import build_agent_graph, get_key_status
-
-# --- SECURITY & REPORTING MODULES ---
 from guru_security import check_password, logout
-from guru_report import generate_pdf
+from guru_warmup import start_prewarm
 
 # --- UI CONFIG ---
 st.set_page_config(page_title="Ask-GuruAi", layout="wide", page_icon="💡")
 
 # --- 1. SECURITY GATE (Login Screen) ---
 if not check_password():
+    # Load the heavy stacks in the background while the user signs in
+    start_prewarm()
     st.stop()
 
+# --- HEAVY MODULES (loaded after login, usually already pre-warmed) ---
+import matplotlib.pyplot as plt
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from guru_engine import DataEngine
+from guru_brain import build_agent_graph, get_key_status, fast_answer, search_answer
+from guru_router import classify_prompt, get_route_stats, ROUTE_DATA, ROUTE_SEARCH
+from guru_hedge import get_hedge_policy
+from guru_cache import get_answer_cache, cache_scope, depends_on_context, prewarm_embedder
+from guru_report import generate_pdf
+from guru_trace import start_trace, span, render_waterfall
+from guru_snapshot import snapshot_engine_async, restore_engine, delete_snapshot
+
 init_db()
+prewarm_embedder()
 
 # --- INITIALIZE STATE ---
 if "data_engine" not in st.session_state: st.session_state.data_engine = DataEngine()
+if "turn_traces" not in st.session_state: st.session_state.turn_traces = {}
+if "turn_artifacts" not in st.session_state: st.session_state.turn_artifacts = {}
 engine = st.session_state.data_engine
 
 # --- MULTI-USER SESSION MANAGEMENT ---
@@ -39,6 +51,18 @@ if not st.session_state.current_session_id.startswith(f"{current_user}-"):
 
 current_sess = st.session_state.current_session_id
 
+# --- ONE ENGINE PER CHAT ---
+# Switching chats (or a worker restart) starts from that chat's snapshot, so one
+# chat's variables are never written into another chat's snapshot.
+# Only the manifest is read here, data loads when the analysis first uses it.
+if engine.session_id != current_sess:
+    if engine.session_id is not None:
+        engine = st.session_state.data_engine = DataEngine()
+    engine.session_id = current_sess
+    restored = restore_engine(engine, current_sess)
+    if restored:
+        st.toast(f"♻️ Restored {len(restored)} variable(s) from your last session: {', '.join(restored)}")
+
 # --- BUILD BRAIN ---
 app = build_agent_graph(engine)
 
@@ -52,6 +76,7 @@ with st.sidebar:
     st.title("⚡ GURU HQ")
     st.write(f"👤 **User:** {current_user}")
     st.caption(get_key_status())
+    st.caption(get_hedge_policy().summary())
 
     # --- POSITION 1: LOGOUT ---
     if st.button("🔒 Logout", use_container_width=True):
@@ -69,6 +94,7 @@ with st.sidebar:
     with col2:
         if st.button("🗑️ Clear", use_container_width=True):
             clear_session(current_sess)
+            delete_snapshot(current_sess)
             st.rerun()
 
     # List recent sessions
@@ -96,11 +122,32 @@ with st.sidebar:
         st.info(f"Loading Sheet: {gsheet_url}...")
 
     if uploaded_file:
+        previous_digest = engine.dataset_digest
         status = engine.load_file(uploaded_file)
         if "Error" in status:
             st.error(status)
         else:
             st.success(status)
+            if engine.dataset_digest != previous_digest:
+                with start_trace(current_sess), span("snapshot", "engine"):
+                    snapshot_engine_async(engine, engine.session_id)
+
+    # Footprint measured by the memory governor after the last execution
+    memory = engine.memory_report
+    if memory is not None:
+        st.caption(f"🧠 {memory.summary()}")
+        if memory.level == "over":
+            st.error("🧠 Memory limit reached even after freeing unused variables. Try a smaller dataset or a new session.")
+        elif memory.level == "warn" and memory.sessions_bytes / memory.process_bytes < 0.5:
+            st.warning(f"🧠 Shared datasets use {memory.shared_bytes / 2**20:.0f} MB of this worker's memory. "
+                       "Close unused sessions or load smaller files.")
+        elif memory.level == "warn":
+            st.warning("🧠 Memory is close to the limit. Older intermediate results will be moved to disk soon.")
+        for action in memory.actions:
+            st.caption(f"🧹 {action}")
+
+    st.toggle("♻️ Reuse cached answers", value=True, key="use_answer_cache",
+              help="Serve near-identical questions on the same dataset from the team answer cache.")
 
     if st.button("🧹 Clear Plots", use_container_width=True):
         plt.clf()
@@ -113,24 +160,45 @@ with st.sidebar:
     # --- POSITION 4: REPORTING ---
     st.markdown("### 📄 Reporting")
     if st.button("📥 Export PDF Report", use_container_width=True):
-        with st.spinner("Compiling PDF..."):
+        with st.spinner("Compiling PDF..."), start_trace(current_sess):
             history = load_history(current_sess)
             pdf_file = generate_pdf(history, current_sess)
         with open(pdf_file, "rb") as f:
             st.download_button("⬇️ Download PDF", f, file_name=pdf_file, use_container_width=True)
 
 # --- CHAT INTERFACE ---
+def render_artifacts(artifacts):
+    """Shows compacted tool outputs in full, collapsed by default."""
+    saved = sum(a["tokens_before"] - a["tokens_after"] for a in artifacts)
+    st.caption(f"🗜️ Compacted {len(artifacts)} tool output(s) · ~{saved:,} tokens kept out of the LLM context")
+    for a in artifacts:
+        with st.expander(f"📄 Full output {a['id']} ({a['tokens_before']:,} tokens)"):
+            st.code(a["output"], language=None)
+
+
 st.title("GuruAi Intelligent Analytics")
 
 # Load History
 history = load_history(current_sess)
-for msg in history:
+for i, msg in enumerate(history):
     role = "user" if msg["role"] == "user" else "assistant"
     with st.chat_message(role, avatar=theme_data["user_avatar"] if role == "user" else theme_data["ai_avatar"]):
         st.markdown(msg["content"])
+        if (current_sess, i) in st.session_state.turn_artifacts:
+            render_artifacts(st.session_state.turn_artifacts[(current_sess, i)])
+        if (current_sess, i) in st.session_state.turn_traces:
+            render_waterfall(st.session_state.turn_traces[(current_sess, i)])
 
 # --- INPUT HANDLING ---
+def rerun_without_cache(text):
+    st.session_state.rerun_prompt = text
+
+
 prompt = st.chat_input("Enter analysis command...")
+bypass_cache = False
+if not prompt and "rerun_prompt" in st.session_state:
+    prompt = st.session_state.pop("rerun_prompt")
+    bypass_cache = True
 
 if prompt:
     # 1. UI Echo
@@ -143,10 +211,14 @@ if prompt:
         engine.column_str = ", ".join(list(engine.df.columns))
 
     # 3. Construct System Prompt (Simplified)
-    system_text = "You are GuruAi, a professional data analyst. Use 'python_analysis' for data tasks."
+    system_text = "You are GuruAi, a professional data analyst. Use 'python_analysis' for data tasks. " \
+                  "Call independent tools (e.g. a web search and a computation) together in one step."
 
     if engine.df is not None:
         system_text += f"\n[DATA ACTIVE] Columns: {engine.column_str}. ALWAYS use print() to show table outputs."
+    if engine.sheets is not None and len(engine.sheets) > 1:
+        system_text += f"\n[WORKBOOK] Sheets: {', '.join(engine.sheets)}. 'df' is the first sheet; " \
+                       "load others with sheets['<name>'] (parsed on first use)."
 
     # 4. Context Window
     recent_history = history[-2:]
@@ -159,34 +231,116 @@ if prompt:
     # 5. Run Agent
     with st.chat_message("assistant", avatar=theme_data["ai_avatar"]):
         status_box = st.status("Thinking...", expanded=True)
-        try:
-            final_resp = ""
-            # Stream the graph events
-            for event in app.stream({"messages": messages}, config={"recursion_limit": 60}, stream_mode="values"):
-                msg = event["messages"][-1]
-
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    for t in msg.tool_calls:
-                        status_box.write(f"⚙️ Action: `{t['name']}`")
-
-                if isinstance(msg, AIMessage) and msg.content and not msg.tool_calls:
-                    final_resp = msg.content
-
-            # A. Render Chart (if generated)
-            if engine.latest_figure:
-                st.pyplot(engine.latest_figure)
-                chart_path = f"chart_{current_sess}.png"
-                engine.latest_figure.savefig(chart_path)
-                engine.latest_figure = None
-
-            # B. Render Text Response
-            if final_resp:
-                st.markdown(final_resp)
-                status_box.update(label="Complete", state="complete", expanded=False)
-                save_message(current_sess, "assistant", final_resp)
-            else:
-                status_box.update(label="Task Completed", state="complete", expanded=False)
-
-        except Exception as e:
-            status_box.update(label="Error", state="error")
-            st.error(f"Error: {e}")
\ No newline at end of file
+        with start_trace(current_sess) as trace:
+            try:
+                final_resp = ""
+                charts = []
+                artifact_mark = engine.artifact_seq
+                turn_start = time.perf_counter()
+                columns = list(engine.df.columns) if engine.df is not None else []
+
+                # Answers are shared per dataset, as long as this session still works on the upload as-is
+                # (content, not identity: in-place edits keep the same object) and the prompt stands alone
+                scope_key = None
+                if engine.dataset_digest and not depends_on_context(prompt, bool(history)) \
+                        and engine.working_df_is_upload():
+                    scope_key = cache_scope(current_user, engine.dataset_digest)
+
+                cached = None
+                if scope_key and st.session_state.get("use_answer_cache", True) and not bypass_cache:
+                    with span("cache", "lookup") as cache_attrs:
+                        cached, similarity = get_answer_cache().lookup(scope_key, prompt, columns)
+                        cache_attrs["hit"] = cached is not None
+                        cache_attrs["similarity"] = round(similarity, 3)
+
+                if cached is not None:
+                    route_taken = "cache"
+                    final_resp = cached.answer
+                    for png in cached.charts:
+                        st.image(png)
+                    if cached.charts:
+                        # Keep the PDF export in step with what the user sees
+                        with open(f"chart_{current_sess}.png", "wb") as f:
+                            f.write(cached.charts[-1])
+                else:
+                    previous_reply = next((m["content"] for m in reversed(history) if m["role"] != "user"), "")
+                    decision = classify_prompt(prompt, engine.df is not None, columns, previous_reply=previous_reply)
+                    route_taken = decision.route
+
+                    # Simple turns skip the tool-enabled graph and the 70B model
+                    with span("route", decision.route, reason=decision.reason,
+                              router_ms=round(decision.router_ms, 3)) as route_attrs:
+                        if decision.route != ROUTE_DATA:
+                            status_box.write(f"⚡ Fast path: `{decision.route}` ({decision.reason})")
+                            try:
+                                if decision.route == ROUTE_SEARCH:
+                                    final_resp = search_answer(messages, prompt).content
+                                else:
+                                    final_resp = fast_answer(messages).content
+                            except Exception as e:
+                                route_attrs["fallback"] = str(e)
+
+                    if not final_resp:
+                        route_taken = ROUTE_DATA
+                        # Stream the graph events
+                        for event in app.stream({"messages": messages}, config={"recursion_limit": 60}, stream_mode="values"):
+                            msg = event["messages"][-1]
+
+                            if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                                for t in msg.tool_calls:
+                                    status_box.write(f"⚙️ Action: `{t['name']}`")
+
+                            if isinstance(msg, AIMessage) and msg.content and not msg.tool_calls:
+                                final_resp = msg.content
+
+                    # Log what routing saved against the average full-graph turn (lands in the trace export)
+                    route_stats = get_route_stats()
+                    turn_ms = (time.perf_counter() - turn_start) * 1000
+                    route_attrs["taken"] = route_taken
+                    route_attrs["saved_ms"] = round(route_stats.estimated_savings(route_taken, turn_ms), 1)
+                    route_stats.record(route_taken, turn_ms)
+
+                # A. Render Chart (if generated)
+                if engine.latest_figure:
+                    with span("render", "chart"):
+                        st.pyplot(engine.latest_figure)
+                        chart_path = f"chart_{current_sess}.png"
+                        engine.latest_figure.savefig(chart_path)
+                        with open(chart_path, "rb") as f:
+                            charts.append(f.read())
+                    engine.latest_figure = None
+
+                # B. Render Text Response
+                if final_resp:
+                    st.markdown(final_resp)
+                    if cached is not None:
+                        st.caption(f"♻️ Cached answer · similarity {similarity:.2f} · originally asked: \"{cached.prompt}\"")
+                        st.button("🔄 Re-run without cache", key=f"bypass_{len(history)}",
+                                  on_click=rerun_without_cache, args=(prompt,))
+                        status_box.update(label="Served from cache", state="complete", expanded=False)
+                    else:
+                        status_box.update(label="Complete", state="complete", expanded=False)
+                        # The turn's code may have changed df; only answers about the untouched upload are shared
+                        if scope_key and route_taken == ROUTE_DATA and not final_resp.startswith("❌") \
+                                and engine.working_df_is_upload():
+                            get_answer_cache().store(scope_key, prompt, final_resp, charts, columns)
+                    save_message(current_sess, "assistant", final_resp)
+                    if route_taken == ROUTE_DATA:
+                        # Incremental, and hashed/written by the snapshot worker off this thread
+                        with span("snapshot", "engine"):
+                            snapshot_engine_async(engine, engine.session_id)
+                    # History index of this reply: prior turns + user prompt
+                    st.session_state.turn_traces[(current_sess, len(history) + 1)] = trace.spans
+
+                    new_artifacts = engine.artifacts_since(artifact_mark)
+                    if new_artifacts:
+                        render_artifacts(new_artifacts)
+                        st.session_state.turn_artifacts[(current_sess, len(history) + 1)] = new_artifacts
+                else:
+                    status_box.update(label="Task Completed", state="complete", expanded=False)
+
+            except Exception as e:
+                status_box.update(label="Error", state="error")
+                st.error(f"Error: {e}")
+
+        render_waterfall(trace)
\ No newline at end of file
@@ -1,14 +1,17 @@
 import streamlit as st
-from supabase import create_client, Client
+from guru_trace import traced
 
 
 # --- CONNECTION MANAGER ---
 @st.cache_resource
-def get_supabase_client() -> Client:
+def get_supabase_client():
     """
     Establishes a connection to Supabase using secrets.
     Includes validation to catch httpx.ConnectError triggers early.
     """
+    # Imported here so the login form renders before the client library loads
+    from supabase import create_client
+
     try:
         # 1. Fetch credentials from Streamlit Secrets
         url = st.secrets.get("SUPABASE_URL")
@@ -43,6 +46,7 @@ def init_db():
 
 # --- CHAT HISTORY FUNCTIONS ---
 
+@traced("db")
 def save_message(session_id, role, content):
     """Saves a message to Supabase with the current username."""
     client = get_supabase_client()
@@ -57,6 +61,7 @@ def save_message(session_id, role, content):
     client.table("chat_history").insert(data).execute()
 
 
+@traced("db")
 def load_history(session_id):
     """Loads chat history for a specific session."""
     client = get_supabase_client()
@@ -68,12 +73,14 @@ def load_history(session_id):
     return response.data
 
 
+@traced("db")
 def clear_session(session_id):
     """Deletes all messages for a specific session."""
     client = get_supabase_client()
     client.table("chat_history").delete().eq("session_id", session_id).execute()
 
 
+@traced("db")
 def get_all_sessions():
     """Retrieves unique session IDs for the logged-in user."""
     client = get_supabase_client()
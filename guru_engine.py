@@ -3,13 +3,91 @@ import pandas as pd
 import numpy as np
 import sys
 import re
+import weakref
+import importlib.util
+from collections import deque
+from collections.abc import Mapping
 import matplotlib
 # ✅ FIX: Force non-interactive backend for Cloud
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import seaborn as sns
-from io import StringIO
+from io import StringIO, BytesIO
 from guru_insights import InsightModule
+from guru_store import get_dataset_store, content_hash
+from guru_compact import compact_output, estimate_tokens
+from guru_trace import span
+from guru_governor import MemoryGovernor
+from guru_snapshot import UPLOAD_KEY
+
+# --- EXCEL INGEST ---
+# calamine (Rust) parses xlsx many times faster than openpyxl when installed
+HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+
+
+def excel_sheet_names(raw_bytes, name):
+    """Lists sheets without parsing any cell data."""
+    if HAS_CALAMINE:
+        from python_calamine import CalamineWorkbook
+        return list(CalamineWorkbook.from_filelike(BytesIO(raw_bytes)).sheet_names)
+    if name.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(BytesIO(raw_bytes), read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    return list(pd.ExcelFile(BytesIO(raw_bytes)).sheet_names)
+
+
+def read_excel_sheet(raw_bytes, name, sheet):
+    """
+    Parses one sheet with pandas (same header handling as pd.read_excel).
+    openpyxl is opened read-only by pandas, so rows stream instead of
+    building the full workbook.
+    """
+    if HAS_CALAMINE:
+        engine = "calamine"
+    elif name.endswith('.xlsx'):
+        engine = "openpyxl"
+    else:
+        engine = None
+    return pd.read_excel(BytesIO(raw_bytes), sheet_name=sheet, engine=engine)
+
+
+class LazySheets(Mapping):
+    """
+    Workbook sheets by name. A sheet is parsed on first access and shared
+    with other sessions through the dataset store (keyed by file hash + sheet).
+    `raw_bytes` should be the store's shared copy of the upload.
+    """
+
+    def __init__(self, engine, digest, raw_bytes, name, sheet_names):
+        self._engine = engine
+        self._digest = digest
+        self._raw_bytes = raw_bytes
+        self._name = name
+        self._names = list(sheet_names)
+        self._loaded = {}
+
+    def __getitem__(self, sheet):
+        if sheet not in self._names:
+            raise KeyError(f"No sheet named '{sheet}'. Sheets: {', '.join(self._names)}")
+        if sheet not in self._loaded:
+            self._loaded[sheet] = self._engine._acquire(
+                f"{self._digest}:{sheet}",
+                lambda: read_excel_sheet(self._raw_bytes, self._name, sheet)
+            )
+        return self._loaded[sheet]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def loaded(self):
+        return list(self._loaded)
+
 
 class DataEngine:
     def __init__(self):
@@ -18,28 +96,212 @@ class DataEngine:
             "pd": pd,
             "np": np,
             "plt": plt,
-            "sns": sns,
             "st": st,
             "insights": self.insights
         }
-        self.df = None
+        self._df = None
         self.column_str = ""
         self.latest_figure = None
+        self.dataset_digest = None
+        self.sheets = None
+        self._dataset_releases = []
+        self._source_id = None
+        self._load_status = ""
+        # Full tool outputs that were compacted before reaching the LLM
+        self.output_artifacts = deque(maxlen=20)
+        self.artifact_seq = 0
+        # Snapshot variables not read back yet (name -> loader), see restore_lazily
+        self._pending = {}
+        self._restored = False
+        self._restored_store_key = None
+        # Store key of the pristine frame behind engine.df (None for private frames)
+        self._df_store_key = None
+        # Chat session this engine was loaded or restored for; snapshots only go there
+        self.session_id = None
+        self.governor = MemoryGovernor(self)
+        self.memory_report = None
+
+    @property
+    def df(self):
+        if self._df is None and UPLOAD_KEY in self._pending:
+            self._materialize(UPLOAD_KEY)
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        self._df = value
+
+    @property
+    def loaded_df(self):
+        """engine.df if it is in memory; never triggers a restore."""
+        return self._df
+
+    def has_data(self):
+        """True when a dataset is loaded or waiting to be restored, without reading it."""
+        return self._df is not None or UPLOAD_KEY in self._pending
+
+    def upload_store_key(self):
+        return self._df_store_key
+
+    def pristine_upload(self):
+        """The upload as parsed, without the session's edits; never triggers a restore."""
+        if self._df_store_key:
+            return get_dataset_store().peek(self._df_store_key)
+        return self._df
+
+    def restore_lazily(self, loaders, upload_store_key, digest, column_str):
+        """
+        Registers snapshot loaders; nothing is read until a variable is used.
+        loaders[UPLOAD_KEY] reads the original upload (engine.df); a loader of
+        "upload" means the variable was the untouched upload.
+        """
+        self._pending = dict(loaders)
+        self._restored = True
+        self._restored_store_key = upload_store_key
+        self.dataset_digest = digest
+        self.column_str = column_str
+        self._source_id = None
+
+    def spill(self, name, loader):
+        """Drops a variable from memory; it is read back the next time code uses it."""
+        self.scope.pop(name, None)
+        self._pending[name] = loader
+
+    def working_df_is_upload(self):
+        """
+        True when scope['df'] still holds exactly the uploaded data. Compares
+        content with the pristine shared frame, so in-place edits count too.
+        """
+        working = self.scope.get("df")
+        original = get_dataset_store().peek(self._df_store_key) if self._df_store_key else None
+        if original is None or not isinstance(working, pd.DataFrame):
+            return False
+        return working.shape == original.shape and working.equals(original)
+
+    def pending_restores(self):
+        return list(self._pending)
+
+    def _restore_upload(self, loader):
+        # Share the store's frame when another session has this file loaded. A snapshot
+        # is never put into the store: only a real upload may populate a file-hash key.
+        key = self._restored_store_key
+        store = get_dataset_store()
+        shared = store.acquire_existing(key) if key else None
+        if shared is not None:
+            self._dataset_releases.append(weakref.finalize(self, store.release, key))
+            self._df_store_key = key
+            return shared
+        self._df_store_key = None
+        return loader()
+
+    def _materialize(self, name):
+        loader = self._pending.pop(name)
+        try:
+            if name == UPLOAD_KEY:
+                self._df = self._restore_upload(loader)
+                return self._df
+            if loader == "upload":
+                # A view, so in-place edits to df never reach engine.df (Copy-on-Write)
+                value = self.df.copy(deep=False) if self.df is not None else None
+            else:
+                value = loader()
+        except Exception:
+            return None  # snapshot file gone or unreadable; the variable is simply absent
+
+        if value is not None:
+            self.scope[name] = value
+        return value
+
+    def _acquire(self, key, loader):
+        # Shared frame from the store; our reference is dropped on release or GC
+        store = get_dataset_store()
+        frame = store.acquire(key, loader)
+        self._dataset_releases.append(weakref.finalize(self, store.release, key))
+        return frame
+
+    def _release_dataset(self, releases):
+        # Hand our references back to the shared store (each runs at most once)
+        for release in releases:
+            release()
+
+    def _share_workbook(self, digest, raw_bytes, name):
+        # Unparsed sheets need the file; every session holds the same copy
+        store = get_dataset_store()
+        raw_bytes = store.share_bytes(digest, raw_bytes)
+        self._dataset_releases.append(weakref.finalize(self, store.release_bytes, digest))
+        return LazySheets(self, digest, raw_bytes, name, excel_sheet_names(raw_bytes, name))
+
+    def _read_table(self, name, raw_bytes):
+        buffer = BytesIO(raw_bytes)
+        if name.endswith('.csv'):
+            return pd.read_csv(buffer)
+        return pd.read_json(buffer)
 
     def load_file(self, uploaded_file):
         try:
             name = uploaded_file.name
             if name.endswith(('.csv', '.xlsx', '.xls', '.json')):
-                if name.endswith('.csv'):
-                    self.df = pd.read_csv(uploaded_file)
-                elif 'xls' in name:
-                    self.df = pd.read_excel(uploaded_file)
-                elif name.endswith('.json'):
-                    self.df = pd.read_json(uploaded_file)
+                # Streamlit hands us the same upload on every rerun; keep the session's state
+                source_id = getattr(uploaded_file, "file_id", None)
+                if source_id is not None and source_id == self._source_id:
+                    return self._load_status
+
+                # Identical uploads across sessions share one parsed frame
+                raw_bytes = uploaded_file.getvalue()
+                digest = content_hash(raw_bytes)
+                if self._restored and digest == self.dataset_digest and self.has_data():
+                    # The restored session's own file is still in the uploader: keep its restored state
+                    if name.endswith(('.xlsx', '.xls')):
+                        # Sheets are not snapshotted; point them back at the upload (nothing is parsed)
+                        self.sheets = self._share_workbook(digest, raw_bytes, name)
+                        self.scope["sheets"] = self.sheets
+                    self._source_id = source_id
+                    self._restored = False
+                    self._load_status = f"✅ Data Restored. Columns: {self.column_str}"
+                    return self._load_status
+
+                # New references collect in a fresh list; the old ones go only once parsing succeeds
+                old_releases, self._dataset_releases = self._dataset_releases, []
+                try:
+                    if name.endswith(('.xlsx', '.xls')):
+                        sheets = self._share_workbook(digest, raw_bytes, name)
+                        # Only the first sheet is parsed up front; the rest load when the analysis touches them
+                        first_sheet = next(iter(sheets))
+                        shared_df = sheets[first_sheet]
+                        store_key = f"{digest}:{first_sheet}"
+                    else:
+                        sheets = None
+                        shared_df = self._acquire(digest, lambda: self._read_table(name, raw_bytes))
+                        store_key = digest
+                except Exception as e:
+                    # Keep the previous dataset and remember the bad upload, so reruns do not parse it again
+                    self._release_dataset(self._dataset_releases)
+                    self._dataset_releases = old_releases
+                    self._source_id = source_id
+                    self._load_status = f"❌ Error: {str(e)}"
+                    return self._load_status
+
+                self._release_dataset(old_releases)
+                self.sheets = sheets
+                if sheets is not None:
+                    self.scope["sheets"] = sheets
+                else:
+                    self.scope.pop("sheets", None)
+                self._df_store_key = store_key
+                # A new upload replaces any dataset still waiting in a snapshot
+                self._pending.pop(UPLOAD_KEY, None)
+                self._pending.pop("df", None)
+                self.dataset_digest = digest
+                self._restored = False
+                self._source_id = source_id
+                self.df = shared_df
 
                 self.column_str = ", ".join(list(self.df.columns))
                 self.scope["df"] = self.df
-                return f"✅ Data Loaded: {len(self.df)} rows. Columns: {self.column_str}"
+                self._load_status = f"✅ Data Loaded: {len(self.df)} rows. Columns: {self.column_str}"
+                if self.sheets is not None and len(self.sheets) > 1:
+                    self._load_status += f" | Sheets: {', '.join(self.sheets)} (df = '{first_sheet}')"
+                return self._load_status
 
             elif name.endswith(('.txt', '.py', '.md', '.log', '.yaml')):
                 stringio = StringIO(uploaded_file.getvalue().decode("utf-8"))
@@ -75,8 +337,42 @@ class DataEngine:
         healed_code = re.sub(pattern, replace_match, code)
         return healed_code
 
+    def _compact_output(self, code: str, output: str) -> str:
+        with span("tool", "compact") as attrs:
+            compacted, was_compacted = compact_output(output)
+            if not was_compacted:
+                return output
+
+            self.artifact_seq += 1
+            artifact = {
+                "seq": self.artifact_seq,
+                "id": f"out-{self.artifact_seq}",
+                "code": code,
+                "output": output,
+                "tokens_before": estimate_tokens(output),
+                "tokens_after": estimate_tokens(compacted),
+            }
+            self.output_artifacts.append(artifact)
+            attrs["tokens_before"] = artifact["tokens_before"]
+            attrs["tokens_after"] = artifact["tokens_after"]
+            return compacted + f"\n[Output compacted; full {artifact['tokens_before']}-token output saved for the user as {artifact['id']}.]"
+
+    def artifacts_since(self, seq: int):
+        return [a for a in self.output_artifacts if a["seq"] > seq]
+
+    def _load_lazy_modules(self, code: str):
+        # seaborn costs over a second to import, so only load it when the code uses it
+        if "sns" in code and "sns" not in self.scope:
+            import seaborn as sns
+            self.scope["sns"] = sns
+        # Restored snapshot variables are read back the first time code mentions them
+        for name in self.pending_restores():
+            if name in self._pending and re.search(rf"\b{re.escape(name)}\b", code):
+                self._materialize(name)
+
     def run_python_analysis(self, code: str):
         code = self._heal_code(code)
+        self._load_lazy_modules(code)
         old_stdout = sys.stdout
         redirected_output = sys.stdout = StringIO()
 
@@ -89,7 +385,7 @@ class DataEngine:
             pd.set_option('display.width', 1000)
 
             exec(code, self.scope)
-            result = redirected_output.getvalue()
+            result = self._compact_output(code, redirected_output.getvalue())
 
             if plt.get_fignums():
                 ax = plt.gca()
@@ -107,4 +403,14 @@ class DataEngine:
         except Exception as e:
             return f"❌ Execution Error: {str(e)}"
         finally:
-            sys.stdout = old_stdout
\ No newline at end of file
+            sys.stdout = old_stdout
+            with span("tool", "memory") as attrs:
+                # Never let memory housekeeping replace the analysis result
+                try:
+                    self.memory_report = self.governor.enforce(self, code, self.session_id)
+                except Exception as e:
+                    attrs["error"] = str(e)
+                else:
+                    attrs["session_mb"] = round(self.memory_report.session_bytes / 2**20, 1)
+                    if self.memory_report.actions:
+                        attrs["actions"] = "; ".join(self.memory_report.actions)
\ No newline at end of file
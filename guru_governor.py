@@ -0,0 +1,224 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import os
+import re
+import sys
+import types
+import weakref
+import threading
+import matplotlib.pyplot as plt
+from guru_store import get_dataset_store
+from guru_snapshot import ENGINE_NAMES, spill_variables
+
+# --- CONFIGURATION ---
+MB = 1024 * 1024
+SESSION_MEMORY_BUDGET = int(os.environ.get("GURU_SESSION_MEMORY_MB", 512)) * MB
+PROCESS_MEMORY_BUDGET = int(os.environ.get("GURU_PROCESS_MEMORY_MB", 2048)) * MB
+MEMORY_WARN_FRACTION = 0.8   # warn in the sidebar from here on
+MAX_OPEN_FIGURES = 3         # pyplot figures kept open after an execution
+
+# The working `df` and upload-derived objects are never spilled or evicted
+PROTECTED_NAMES = ENGINE_NAMES | {"df", "file_content"}
+
+
+def footprint(value):
+    """Deep size in bytes for the object types that dominate a session's memory."""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple, set, dict)) and len(value) < 10_000:
+        items = value.values() if isinstance(value, dict) else value
+        # One level deep: catches the common dict/list of DataFrames
+        return sys.getsizeof(value) + sum(
+            footprint(v) if isinstance(v, (pd.DataFrame, pd.Series, np.ndarray)) else sys.getsizeof(v)
+            for v in items
+        )
+    return sys.getsizeof(value)
+
+
+def _open_figures():
+    """Open pyplot figures and the current one, leaving gcf() where it was."""
+    if not plt.get_fignums():
+        return [], None
+    current = plt.gcf()
+    figures = [plt.figure(n) for n in plt.get_fignums()]
+    plt.figure(current.number)
+    return figures, current
+
+
+def figure_footprint(fig):
+    # Agg keeps an RGBA buffer of the rendered canvas
+    width, height = fig.get_size_inches() * fig.dpi
+    return int(width * height * 4)
+
+
+class MemoryLedger:
+    """Per-session usage of every session in this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = {}
+
+    def update(self, key, nbytes):
+        with self._lock:
+            self._usage[key] = nbytes
+
+    def forget(self, key):
+        with self._lock:
+            self._usage.pop(key, None)
+
+    def total(self):
+        with self._lock:
+            return sum(self._usage.values())
+
+    def sessions(self):
+        with self._lock:
+            return len(self._usage)
+
+
+@st.cache_resource
+def get_memory_ledger() -> MemoryLedger:
+    """One ledger per worker process, shared by all sessions."""
+    return MemoryLedger()
+
+
+class MemoryReport:
+    def __init__(self, session_bytes, shared_bytes, sessions_bytes, figures, actions):
+        self.session_bytes = session_bytes
+        self.shared_bytes = shared_bytes      # shared datasets; no single session can free them
+        self.sessions_bytes = sessions_bytes  # every session's own usage in this worker
+        self.figures = figures
+        self.actions = actions  # what the governor did this run
+
+    @property
+    def process_bytes(self):
+        return self.sessions_bytes + self.shared_bytes
+
+    @property
+    def level(self):
+        """
+        'over' when this session or the sessions together exceed their budget,
+        'warn' near it, or when shared datasets push the worker close to its limit.
+        """
+        ratio = max(self.session_bytes / SESSION_MEMORY_BUDGET, self.sessions_bytes / PROCESS_MEMORY_BUDGET)
+        if ratio >= 1.0:
+            return "over"
+        if ratio >= MEMORY_WARN_FRACTION or self.process_bytes / PROCESS_MEMORY_BUDGET >= MEMORY_WARN_FRACTION:
+            return "warn"
+        return "ok"
+
+    def summary(self):
+        return (f"Memory: session {self.session_bytes / MB:.0f}/{SESSION_MEMORY_BUDGET / MB:.0f} MB "
+                f"(+{self.shared_bytes / MB:.0f} MB shared) · worker {self.process_bytes / MB:.0f}/"
+                f"{PROCESS_MEMORY_BUDGET / MB:.0f} MB · {self.figures} figure(s)")
+
+
+class MemoryGovernor:
+    """
+    Keeps one DataEngine inside its memory budget.
+    After every execution it closes stale figures, measures the scope, and
+    spills (or, without a session to spill to, evicts) the largest
+    least-recently-used variables until the session and the worker fit again.
+    """
+
+    def __init__(self, engine):
+        self._tick = 0
+        self._last_used = {}
+        self._ledger = get_memory_ledger()
+        self._key = id(engine)
+        weakref.finalize(engine, self._ledger.forget, self._key)
+
+    def _touch(self, engine, code):
+        self._tick += 1
+        for name in list(engine.scope):
+            if name not in self._last_used or re.search(rf"\b{re.escape(name)}\b", code):
+                self._last_used[name] = self._tick
+
+    def _close_stale_figures(self, engine):
+        # Only the current figure can still become engine.latest_figure
+        figures, current = _open_figures()
+        stale = [f for f in figures if f is not current and f is not engine.latest_figure]
+        for fig in stale:
+            plt.close(fig)
+        return len(stale)
+
+    def _candidates(self, engine):
+        sizes = {}
+        for name, value in engine.scope.items():
+            if name in PROTECTED_NAMES or name.startswith("_"):
+                continue
+            if isinstance(value, (types.ModuleType, types.FunctionType, type)) or value is engine.loaded_df:
+                continue
+            sizes[name] = footprint(value)
+        return sizes
+
+    def measure(self, engine):
+        """Returns (session bytes, shared dataset bytes, open figure count)."""
+        scope_bytes = sum(self._candidates(engine).values())
+        working_df = engine.scope.get("df")
+        if working_df is not None and working_df is not engine.loaded_df:
+            scope_bytes += footprint(working_df)
+
+        figures, _ = _open_figures()
+        if engine.latest_figure is not None and engine.latest_figure not in figures:
+            figures.append(engine.latest_figure)
+        figure_bytes = sum(figure_footprint(f) for f in figures)
+
+        _, _, shared_bytes = get_dataset_store().stats()
+        return scope_bytes + figure_bytes, shared_bytes, len(figures)
+
+    def enforce(self, engine, code="", session_id=None):
+        """Runs after an execution. Returns a MemoryReport."""
+        self._touch(engine, code)
+        actions = []
+
+        if len(plt.get_fignums()) > MAX_OPEN_FIGURES:
+            actions.append(f"closed {self._close_stale_figures(engine)} stale figure(s)")
+
+        session_bytes, shared_bytes, figures = self.measure(engine)
+        self._ledger.update(self._key, session_bytes)
+        sessions_bytes = self._ledger.total()
+
+        # Shared datasets are left out of the target: no session can free them, so they only warn.
+        # Over the worker budget, each session frees its proportional share, never more than it holds.
+        over_session = session_bytes - SESSION_MEMORY_BUDGET
+        over_process = sessions_bytes - PROCESS_MEMORY_BUDGET
+        process_share = over_process * session_bytes / sessions_bytes if over_process > 0 and sessions_bytes else 0
+        excess = min(max(over_session, process_share), session_bytes)
+        if excess > 0:
+            # Largest first among the least recently used; this run's variables go last
+            sizes = self._candidates(engine)
+            order = sorted(sizes, key=lambda n: (self._last_used.get(n, 0), -sizes[n]))
+            victims, freed = [], 0
+            for name in order:
+                if freed >= excess:
+                    break
+                victims.append(name)
+                freed += sizes[name]
+
+            spilled = []
+            if victims and session_id:
+                try:
+                    spilled = spill_variables(engine, session_id, victims)
+                except Exception as e:
+                    # Snapshot folder unwritable, disk full, ...: evicting still frees the memory
+                    actions.append(f"could not spill to disk ({e})")
+            if spilled:
+                actions.append(f"spilled {', '.join(spilled)} to disk (reloaded when used again)")
+            # Without a snapshot to spill to (or if a value cannot be pickled) the variable is dropped
+            evicted = [name for name in victims if name not in spilled]
+            for name in evicted:
+                engine.scope.pop(name, None)
+            if evicted:
+                actions.append(f"evicted {', '.join(evicted)}")
+            for name in victims:
+                self._last_used.pop(name, None)
+
+            session_bytes -= freed
+            sessions_bytes -= freed
+            self._ledger.update(self._key, session_bytes)
+
+        return MemoryReport(session_bytes, shared_bytes, sessions_bytes, figures, actions)
@@ -0,0 +1,57 @@
+import streamlit as st
+import threading
+from collections import deque
+
+# --- CONFIGURATION ---
+# Seconds to wait for the primary model's first token before racing the fallback
+HEDGE_DEADLINE = float(st.secrets.get("HEDGE_DEADLINE_SECONDS", 4.0))
+HEDGE_MIN_DEADLINE = 1.0
+HEDGE_MAX_DEADLINE = 15.0
+HEDGE_MIN_SAMPLES = 20
+HEDGE_QUANTILE = 0.95
+
+
+class HedgePolicy:
+    """
+    Adaptive hedging deadline per model.
+    Keeps a rolling window of first-token latencies and fires the fallback
+    once the primary is slower than its usual p95.
+    """
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = {}
+        self.stats = {"calls": 0, "hedges": 0, "primary_wins": 0, "hedge_wins": 0}
+
+    def record_latency(self, model_name, seconds):
+        with self._lock:
+            self._latencies.setdefault(model_name, deque(maxlen=self._window)).append(seconds)
+
+    def deadline(self, model_name):
+        """Seconds to wait for a first token before hedging."""
+        with self._lock:
+            self.stats["calls"] += 1
+            samples = sorted(self._latencies.get(model_name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEADLINE
+        p = samples[min(len(samples) - 1, int(HEDGE_QUANTILE * len(samples)))]
+        return min(HEDGE_MAX_DEADLINE, max(HEDGE_MIN_DEADLINE, p))
+
+    def record_hedge(self):
+        with self._lock:
+            self.stats["hedges"] += 1
+
+    def record_race(self, hedge_won):
+        with self._lock:
+            self.stats["hedge_wins" if hedge_won else "primary_wins"] += 1
+
+    def summary(self):
+        s = dict(self.stats)
+        return f"Hedged {s['hedges']}/{s['calls']} calls · fallback won {s['hedge_wins']}, primary won {s['primary_wins']}"
+
+
+@st.cache_resource
+def get_hedge_policy() -> HedgePolicy:
+    """One policy per worker process so latency history is shared by all sessions."""
+    return HedgePolicy()
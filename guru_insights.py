@@ -1,9 +1,9 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.ensemble import IsolationForest
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+# sklearn, statsmodels and seaborn are imported inside the methods that use
+# them; they are the slowest imports in the app and most turns never need them.
 
 
 class InsightModule:
@@ -16,6 +16,8 @@ class InsightModule:
         pass
 
     def check_anomalies(self, df, column_name, contamination=0.05):
+        from sklearn.ensemble import IsolationForest
+
         # Prep Data
         data = df[[column_name]].dropna()
 
@@ -42,6 +44,8 @@ class InsightModule:
             print("- No significant anomalies detected.")
 
     def forecast_series(self, df, date_col, value_col, periods=30):
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
         # Prep Data
         temp_df = df.copy()
         temp_df[date_col] = pd.to_datetime(temp_df[date_col])
@@ -74,6 +78,8 @@ class InsightModule:
             print(f"❌ Forecasting Error: {str(e)}")
 
     def get_correlation_drivers(self, df, target_col):
+        import seaborn as sns
+
         numeric_df = df.select_dtypes(include=['number'])
         if target_col not in numeric_df.columns:
             print(f"❌ Target column '{target_col}' must be numeric.")
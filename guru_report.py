@@ -1,6 +1,7 @@
 import streamlit as st
 from fpdf import FPDF
 import os
+from guru_trace import traced
 
 
 class PDFReport(FPDF):
@@ -15,6 +16,7 @@ class PDFReport(FPDF):
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
 
+@traced("render")
 def generate_pdf(history, session_id):
     pdf = PDFReport()
     pdf.add_page()
@@ -0,0 +1,153 @@
+import streamlit as st
+import re
+import time
+import threading
+from collections import deque
+
+# --- ROUTES ---
+# chat:   MODEL_FAST, no tools (greetings, thanks, definitions)
+# search: one web search, summarized by MODEL_FAST
+# data:   the full tool-enabled agent graph
+ROUTE_CHAT = "chat"
+ROUTE_SEARCH = "search"
+ROUTE_DATA = "data"
+
+# A classifier answer below this confidence is ignored in favor of the safe default
+CLASSIFIER_MIN_CONFIDENCE = 0.75
+
+CHAT_PATTERNS = re.compile(
+    r"^\s*(hi|hello|hey|yo|thanks|thank you|thx|ty|ok|okay|cool|great|nice|perfect|awesome|got it|"
+    r"bye|goodbye|good (morning|afternoon|evening)|who are you|what can you do)\b[\s!.?]*$",
+    re.IGNORECASE,
+)
+# Bare confirmations; after an offer ("Shall I plot it?") they ask for the offered work
+ACK_PATTERNS = re.compile(
+    r"^\s*(ok|okay|k|sure|yes|yep|yeah|yup|please|go ahead|do it|go for it|sounds good|great|cool|"
+    r"perfect|nice|got it|alright|fine)\b[\s!.?]*(please|thanks|thank you)?[\s!.?]*$",
+    re.IGNORECASE,
+)
+OFFER_PATTERNS = re.compile(
+    r"(\?\s*$|\b(shall i|should i|would you like|do you want|want me to|let me know if|i can also)\b)",
+    re.IGNORECASE,
+)
+DEFINITION_PATTERNS = re.compile(
+    r"^\s*(what is|what's|what are|define|explain|meaning of|difference between)\b",
+    re.IGNORECASE,
+)
+SEARCH_PATTERNS = re.compile(
+    r"\b(latest|news|today|yesterday|this week|current(ly)?|right now|recent|stock price|"
+    r"weather|who won|search (the )?web|look up|google)\b",
+    re.IGNORECASE,
+)
+# Search keywords that never describe an uploaded dataset ("today" or "latest" can)
+EXTERNAL_PATTERNS = re.compile(
+    r"\b(news|stock price|weather|who won|search (the )?web|look up|google)\b",
+    re.IGNORECASE,
+)
+# Words that point at the user's own records rather than general knowledge
+DATA_REFERENCE_PATTERNS = re.compile(
+    r"\b(our|my|we|us|these|those|how many|how much|which|best[- ]selling|busiest|highest|lowest|"
+    r"most|least|biggest|smallest|sales?|sold|orders?|customers?|products?|revenue|profit|"
+    r"daily|weekly|monthly|month|week|quarter(ly)?|year(ly)?|drop|dip|spike|increase|decrease|growth|decline)\b",
+    re.IGNORECASE,
+)
+DATA_PATTERNS = re.compile(
+    r"\b(df|data ?set|data|table|column|columns|rows?|csv|excel|sheet|file|upload(ed)?|"
+    r"chart|plot|graph|histogram|visuali[sz]e|average|mean|median|sum|total|count|"
+    r"top \d+|bottom \d+|group ?by|correlat\w*|forecast|anomal\w*|trend|distribution|"
+    r"filter|sort|compare|calculate|compute|python|code)\b",
+    re.IGNORECASE,
+)
+
+
+def refers_to_data(text, columns=()):
+    """True when the prompt mentions a column word or talks about the user's own records."""
+    if DATA_REFERENCE_PATTERNS.search(text):
+        return True
+    # order_date -> "order", "date": matches "orders", "dates", ...
+    words = {w for c in columns for w in re.split(r"[^a-z0-9]+", str(c).lower()) if len(w) > 3}
+    return any(re.search(rf"\b{re.escape(w)}", text, re.IGNORECASE) for w in words)
+
+
+class RouteDecision:
+    def __init__(self, route, reason, router_ms=0.0):
+        self.route = route
+        self.reason = reason
+        self.router_ms = router_ms
+
+
+def classify_prompt(prompt, has_data, columns=(), classifier=None, previous_reply=""):
+    """
+    Picks a route for a prompt using local heuristics, optionally refined
+    by `classifier(prompt) -> (route, confidence)`. Ambiguous prompts, and
+    any prompt about a loaded dataset, go to the full agent graph.
+    `previous_reply` is the last assistant message.
+    """
+    t0 = time.perf_counter()
+
+    def decide(route, reason):
+        return RouteDecision(route, reason, (time.perf_counter() - t0) * 1000)
+
+    text = prompt.strip()
+    lowered = text.lower()
+
+    # "ok" after "Shall I plot it?" accepts the offer, so it needs the tools
+    if has_data and ACK_PATTERNS.match(text) and OFFER_PATTERNS.search(previous_reply.strip()[-300:]):
+        return decide(ROUTE_DATA, "accepts previous offer")
+
+    if CHAT_PATTERNS.match(text):
+        return decide(ROUTE_CHAT, "conversational")
+
+    mentions_column = any(str(c).lower() in lowered for c in columns if len(str(c)) > 2)
+    if mentions_column or DATA_PATTERNS.search(text):
+        return decide(ROUTE_DATA, "column mention" if mentions_column else "data keywords")
+
+    # With a dataset loaded, shortcuts only apply to prompts that clearly are not about it
+    about_data = has_data and refers_to_data(text, columns)
+
+    if EXTERNAL_PATTERNS.search(text) or (SEARCH_PATTERNS.search(text) and not about_data):
+        return decide(ROUTE_SEARCH, "fresh-information keywords")
+
+    if classifier is not None:
+        route, confidence = classifier(text)
+        if confidence >= CLASSIFIER_MIN_CONFIDENCE and route in (ROUTE_CHAT, ROUTE_SEARCH, ROUTE_DATA):
+            return decide(route, f"classifier ({confidence:.2f})")
+
+    if DEFINITION_PATTERNS.match(text) and len(text.split()) <= 12 and not about_data:
+        return decide(ROUTE_CHAT, "short definitional question")
+
+    if not has_data and len(text.split()) <= 6:
+        return decide(ROUTE_CHAT, "short prompt, no dataset")
+
+    return decide(ROUTE_DATA, "about the dataset" if about_data else "default")
+
+
+class RouteStats:
+    """Rolling turn latency per route, used to estimate what routing saved."""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._window = window
+
+    def record(self, route, ms):
+        with self._lock:
+            self._latencies.setdefault(route, deque(maxlen=self._window)).append(ms)
+
+    def mean(self, route):
+        with self._lock:
+            samples = self._latencies.get(route)
+            return sum(samples) / len(samples) if samples else None
+
+    def estimated_savings(self, route, ms):
+        """Milliseconds saved versus the average full-graph turn, if known."""
+        baseline = self.mean(ROUTE_DATA)
+        if route == ROUTE_DATA or baseline is None:
+            return 0.0
+        return max(0.0, baseline - ms)
+
+
+@st.cache_resource
+def get_route_stats() -> RouteStats:
+    """One set of routing statistics per worker process."""
+    return RouteStats()
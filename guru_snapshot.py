@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import types
+import pickle
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from matplotlib.artist import Artist
+
+# --- CONFIGURATION ---
+# One folder per chat_history session id: manifest.json plus one file per variable
+SNAPSHOT_DIR = os.environ.get("GURU_SNAPSHOT_DIR", ".guru_snapshots")
+
+# Scope entries the engine recreates itself; never snapshotted
+ENGINE_NAMES = {"pd", "np", "plt", "sns", "st", "insights", "sheets", "__builtins__"}
+UPLOAD_KEY = "__upload__"
+
+# Hashing and writing happen here, off the request thread. Jobs of one session
+# run in submission order; sessions never wait for each other's writes.
+SNAPSHOT_WORKERS = int(os.environ.get("GURU_SNAPSHOT_WORKERS", 4))
+_snapshot_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS, thread_name_prefix="guru-snapshot")
+_queue_lock = threading.Lock()
+_last_job = {}  # session id -> future of its most recently queued job
+
+
+def _after(previous, fn, *args):
+    # An earlier job's failure is reported to its own caller, not this one
+    if previous is not None:
+        wait([previous])
+    return fn(*args)
+
+
+def _forget(session_id, future):
+    with _queue_lock:
+        if _last_job.get(session_id) is future:
+            del _last_job[session_id]
+
+
+def _enqueue(session_id, fn, *args):
+    """Queues fn on the snapshot pool behind this session's earlier jobs only."""
+    with _queue_lock:
+        future = _snapshot_pool.submit(_after, _last_job.get(session_id), fn, *args)
+        _last_job[session_id] = future
+    future.add_done_callback(lambda f: _forget(session_id, f))
+    return future
+
+
+def _wait_for_session(session_id):
+    with _queue_lock:
+        pending = _last_job.get(session_id)
+    if pending is not None:
+        wait([pending])
+
+
+def _session_dir(session_id):
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in session_id)
+    return os.path.join(SNAPSHOT_DIR, safe)
+
+
+def _read_manifest(folder):
+    try:
+        with open(os.path.join(folder, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path, write):
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _fingerprint(value):
+    """Content fingerprint: row hashes for pandas objects, raw bytes for arrays, pickle digest otherwise."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        try:
+            row_hash = int(pd.util.hash_pandas_object(value, index=True).sum())
+            labels = list(map(str, value.columns)) if isinstance(value, pd.DataFrame) else str(value.name)
+            return f"{type(value).__name__}:{value.shape}:{labels}:{row_hash}", None
+        except TypeError:
+            pass  # unhashable cells (lists, dicts): fall back to pickle
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return f"nd:{value.dtype}:{value.shape}:{digest}", None
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    return "pkl:" + hashlib.sha256(payload).hexdigest(), payload
+
+
+# --- CAPTURE (request thread) ---
+def _capture(engine):
+    """
+    Freezes what will be written. DataFrames and Series are captured as
+    Copy-on-Write views and arrays as plain copies, so later edits by the
+    session do not reach the snapshot; they are hashed and serialized on the
+    worker. Small values are pickled right away. Figures are not snapshotted.
+    Returns {name: (kind, value, fingerprint)}.
+    """
+    items = {}
+    for name, value in engine.scope.items():
+        if name in ENGINE_NAMES or name.startswith("_"):
+            continue
+        if isinstance(value, (types.ModuleType, types.FunctionType, type)):
+            continue
+        if name == "df" and engine.working_df_is_upload():
+            items[name] = ("upload", None, "upload")  # restored from __upload__, no second copy
+        elif isinstance(value, pd.DataFrame):
+            items[name] = ("frame", value.copy(deep=False), None)
+        elif isinstance(value, pd.Series):
+            items[name] = ("value", value.copy(deep=False), None)
+        elif isinstance(value, np.ndarray):
+            # numpy has no Copy-on-Write; a memcpy is still far cheaper than pickling and hashing
+            items[name] = ("value", value.copy(), None)
+        elif isinstance(value, Artist):
+            continue  # figures are redrawn by the analysis code, not restored
+        else:
+            try:
+                payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                continue  # not picklable (open files, generators, ...)
+            items[name] = ("pickle", payload, "pkl:" + hashlib.sha256(payload).hexdigest())
+
+    # The pristine upload, kept apart from the working df. A frame from the shared
+    # store is identified by its store key (content hash), so it is never re-hashed.
+    pristine = engine.pristine_upload()
+    if pristine is not None:
+        store_key = engine.upload_store_key()
+        items[UPLOAD_KEY] = ("frame", pristine, f"store:{store_key}" if store_key else None)
+    return items
+
+
+# --- WRITE (snapshot worker) ---
+def _write_frame(folder, name, frame):
+    path = os.path.join(folder, f"{name}.parquet")
+    try:
+        _atomic_write(path, lambda p: frame.to_parquet(p, engine="pyarrow"))
+        return f"{name}.parquet", "parquet"
+    except Exception:
+        # Parquet needs string column names and plain cell types
+        if os.path.exists(f"{path}.tmp"):
+            os.remove(f"{path}.tmp")
+        payload = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+        _write_pickle(folder, name, payload)
+        return f"{name}.pkl", "pickle"
+
+
+def _write_pickle(folder, name, payload):
+    def write(p):
+        with open(p, "wb") as f:
+            f.write(payload)
+    _atomic_write(os.path.join(folder, f"{name}.pkl"), write)
+
+
+def _write_snapshot(session_id, items, pending, meta):
+    folder = _session_dir(session_id)
+    os.makedirs(folder, exist_ok=True)
+    old_vars = (_read_manifest(folder) or {"vars": {}})["vars"]
+    new_vars, written = {}, 0
+
+    # Variables restored lazily and never touched are carried over as they are
+    for name in pending:
+        if name in old_vars:
+            new_vars[name] = old_vars[name]
+
+    for name, (kind, value, fingerprint) in items.items():
+        payload = None
+        if fingerprint is None:
+            try:
+                fingerprint, payload = _fingerprint(value)
+            except Exception:
+                continue  # object cells that cannot be pickled
+        if name in old_vars and old_vars[name]["fingerprint"] == fingerprint:
+            new_vars[name] = old_vars[name]
+            continue
+
+        entry = {"fingerprint": fingerprint, "kind": kind}
+        if kind == "frame":
+            entry["file"], entry["kind"] = _write_frame(folder, name, value)
+        elif kind == "pickle":
+            _write_pickle(folder, name, value)
+            entry["file"] = f"{name}.pkl"
+        elif kind == "value":
+            _write_pickle(folder, name, payload or pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            entry["file"], entry["kind"] = f"{name}.pkl", "pickle"
+        new_vars[name] = entry
+        written += 1
+
+    # Drop files of variables that no longer exist
+    keep = {e["file"] for e in new_vars.values() if "file" in e} | {"manifest.json"}
+    for filename in os.listdir(folder):
+        if filename not in keep and not filename.endswith(".tmp"):
+            os.remove(os.path.join(folder, filename))
+
+    manifest = dict(meta, session_id=session_id, updated=time.time(), vars=new_vars)
+
+    def write_manifest(p):
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+    _atomic_write(os.path.join(folder, "manifest.json"), write_manifest)
+    return written
+
+
+def _submit(engine, session_id):
+    if engine.session_id is not None and engine.session_id != session_id:
+        raise ValueError(f"Engine belongs to session '{engine.session_id}', not '{session_id}'.")
+    meta = {
+        "dataset_digest": engine.dataset_digest,
+        "column_str": engine.column_str,
+        "upload_store_key": engine.upload_store_key(),
+    }
+    return _enqueue(session_id, _write_snapshot, session_id, _capture(engine), engine.pending_restores(), meta)
+
+
+def snapshot_engine_async(engine, session_id):
+    """
+    Incrementally snapshots the engine's DataFrames and picklable variables.
+    Capturing is cheap; fingerprinting and writing run on the snapshot worker.
+    Returns a future with the number of variables written.
+    """
+    return _submit(engine, session_id)
+
+
+def snapshot_engine(engine, session_id):
+    """Like snapshot_engine_async, but waits for the write to finish."""
+    return _submit(engine, session_id).result()
+
+
+# --- RESTORE ---
+def _loader(folder, entry):
+    path = os.path.join(folder, entry["file"])
+    if entry["kind"] == "parquet":
+        return lambda: pd.read_parquet(path, engine="pyarrow")
+
+    def load_pickle():
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    return load_pickle
+
+
+def restore_engine(engine, session_id):
+    """
+    Registers the session's snapshot with the engine without reading any data.
+    Each variable is loaded the first time analysis code (or the app) uses it.
+    Returns the restored variable names, or [] when there is no snapshot.
+    """
+    _wait_for_session(session_id)  # let queued writes for this session land
+    folder = _session_dir(session_id)
+    manifest = _read_manifest(folder)
+    if not manifest:
+        return []
+
+    loaders = {}
+    for name, entry in manifest["vars"].items():
+        if entry["kind"] == "upload":
+            loaders[name] = "upload"  # the working df was the untouched upload
+        else:
+            loaders[name] = _loader(folder, entry)
+    engine.restore_lazily(loaders, manifest.get("upload_store_key"), manifest.get("dataset_digest"),
+                          manifest.get("column_str", ""))
+    return [name for name in loaders if name != UPLOAD_KEY]
+
+
+def spill_variables(engine, session_id, names):
+    """
+    Writes the session snapshot, then drops `names` from memory; each one is
+    read back the next time code uses it. Returns the names actually spilled.
+    """
+    snapshot_engine(engine, session_id)
+    folder = _session_dir(session_id)
+    entries = (_read_manifest(folder) or {"vars": {}})["vars"]
+    spilled = [name for name in names if "file" in entries.get(name, {})]
+    for name in spilled:
+        engine.spill(name, _loader(folder, entries[name]))
+    return spilled
+
+
+def delete_snapshot(session_id):
+    # Queued behind this session's pending writes, so the folder does not reappear
+    _enqueue(session_id, shutil.rmtree, _session_dir(session_id), True).result()
@@ -0,0 +1,123 @@
+import streamlit as st
+import hashlib
+import threading
+from concurrent.futures import Future
+
+# --- COPY-ON-WRITE ---
+# Shared frames are handed out as shallow views. pandas >= 3.0 (pinned in
+# requirements.txt) always runs with Copy-on-Write, so a session that mutates
+# its `df` gets a private copy and never touches the shared original.
+
+
+def content_hash(raw_bytes):
+    """Returns the SHA-256 digest used to deduplicate uploads."""
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+class DatasetStore:
+    """
+    Process-wide store of parsed datasets, keyed by content hash.
+    Every session uploading the same file shares one DataFrame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._refs = {}
+        self._loading = {}  # digest -> Future while one session parses it
+        # Raw uploads kept for lazy parsing (workbook sheets), one copy per content hash
+        self._blobs = {}
+        self._blob_refs = {}
+
+    def acquire(self, digest, loader):
+        """
+        Returns a read-only view of the dataset for `digest`.
+        `loader` is only called when no session holds this dataset yet. It runs
+        outside the lock; sessions asking for the same digest meanwhile wait for it.
+        """
+        while True:
+            with self._lock:
+                frame = self._frames.get(digest)
+                if frame is not None:
+                    self._refs[digest] += 1
+                    return frame.copy(deep=False)
+                pending = self._loading.get(digest)
+                owner = pending is None
+                if owner:
+                    pending = self._loading[digest] = Future()
+
+            if not owner:
+                pending.result()  # re-raises the parse error of the loading session
+                continue
+
+            try:
+                frame = loader()
+            except BaseException as e:
+                with self._lock:
+                    del self._loading[digest]
+                pending.set_exception(e)
+                raise
+
+            with self._lock:
+                self._frames[digest] = frame
+                self._refs[digest] = 1
+                del self._loading[digest]
+            pending.set_result(None)
+            return frame.copy(deep=False)
+
+    def acquire_existing(self, digest):
+        """Like acquire, but only when the dataset is already loaded; None otherwise."""
+        with self._lock:
+            frame = self._frames.get(digest)
+            if frame is None:
+                return None
+            self._refs[digest] += 1
+            return frame.copy(deep=False)
+
+    def peek(self, digest):
+        """The shared frame for `digest` without taking a reference, or None."""
+        with self._lock:
+            frame = self._frames.get(digest)
+        return frame.copy(deep=False) if frame is not None else None
+
+    def release(self, digest):
+        """Drops one reference. The dataset is freed when nobody uses it."""
+        with self._lock:
+            if digest not in self._refs:
+                return
+            self._refs[digest] -= 1
+            if self._refs[digest] <= 0:
+                del self._refs[digest]
+                del self._frames[digest]
+
+    def share_bytes(self, digest, raw_bytes):
+        """Returns the single shared copy of an upload's bytes, taking a reference."""
+        with self._lock:
+            blob = self._blobs.setdefault(digest, raw_bytes)
+            self._blob_refs[digest] = self._blob_refs.get(digest, 0) + 1
+            return blob
+
+    def release_bytes(self, digest):
+        with self._lock:
+            if digest not in self._blob_refs:
+                return
+            self._blob_refs[digest] -= 1
+            if self._blob_refs[digest] <= 0:
+                del self._blob_refs[digest]
+                del self._blobs[digest]
+
+    def stats(self):
+        """Returns (datasets held, total references, shared bytes incl. raw uploads)."""
+        with self._lock:
+            frames = list(self._frames.values())
+            refs = sum(self._refs.values())
+            blob_bytes = sum(len(b) for b in self._blobs.values())
+        # Deep memory usage walks object columns, so measure outside the lock
+        size = sum(int(f.memory_usage(deep=True).sum()) for f in frames)
+        return len(frames), refs, size + blob_bytes
+
+
+@st.cache_resource
+def get_dataset_store() -> DatasetStore:
+    """One store per worker process, shared by all Streamlit sessions."""
+    return DatasetStore()
@@ -0,0 +1,185 @@
+import streamlit as st
+import os
+import sys
+import json
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+# Spans are appended here as OpenTelemetry-style JSON lines
+TRACE_FILE = os.environ.get("GURU_TRACE_FILE", "guru_traces.jsonl")
+
+_active_trace = contextvars.ContextVar("guru_active_trace", default=None)
+_parent_span = contextvars.ContextVar("guru_parent_span", default=None)
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """Collects the timing spans of a single chat turn."""
+
+    def __init__(self, session_id):
+        self.trace_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.started = time.time()
+        self.spans = []
+
+    def total_ms(self):
+        if not self.spans:
+            return 0.0
+        end = max(s["end"] for s in self.spans)
+        return (end - self.started) * 1000
+
+
+@contextmanager
+def start_trace(session_id):
+    """Activates a trace for the current turn and exports it when done."""
+    trace = Trace(session_id)
+    token = _active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _active_trace.reset(token)
+        export_trace(trace)
+
+
+@contextmanager
+def span(stage, name, **attrs):
+    """
+    Times a block of work inside the active trace.
+    `attrs` is a dict the block can extend (e.g. token counts).
+    Outside a trace this is a no-op.
+    """
+    trace = _active_trace.get()
+    if trace is None:
+        yield attrs
+        return
+
+    span_id = uuid.uuid4().hex[:16]
+    record = {
+        "span_id": span_id,
+        "parent_id": _parent_span.get(),
+        "stage": stage,
+        "name": name,
+        "start": time.time(),
+        "status": "OK",
+        "attrs": attrs,
+    }
+    token = _parent_span.set(span_id)
+    try:
+        yield attrs
+    except Exception as e:
+        record["status"] = "ERROR"
+        attrs["error"] = str(e)
+        raise
+    finally:
+        _parent_span.reset(token)
+        record["end"] = time.time()
+        record["duration_ms"] = (record["end"] - record["start"]) * 1000
+        trace.spans.append(record)
+
+
+def traced(stage):
+    """Decorator form of `span`, named after the wrapped function."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- EXPORT ---
+
+def to_otel(trace):
+    """Converts a trace into OpenTelemetry-compatible span records."""
+    records = []
+    for s in trace.spans:
+        records.append({
+            "trace_id": trace.trace_id,
+            "span_id": s["span_id"],
+            "parent_span_id": s["parent_id"],
+            "name": s["name"],
+            "start_time_unix_nano": int(s["start"] * 1e9),
+            "end_time_unix_nano": int(s["end"] * 1e9),
+            "status": {"code": s["status"]},
+            "attributes": {
+                "guru.stage": s["stage"],
+                "guru.session_id": trace.session_id,
+                "guru.duration_ms": round(s["duration_ms"], 3),
+                **{f"guru.{k}": v for k, v in s["attrs"].items()},
+            },
+        })
+    return records
+
+
+def export_trace(trace, path=None):
+    """Appends the spans of a finished trace to the JSONL file."""
+    if not trace.spans:
+        return
+    try:
+        with _write_lock, open(path or TRACE_FILE, "a", encoding="utf-8") as f:
+            for record in to_otel(trace):
+                f.write(json.dumps(record, default=str) + "\n")
+    except OSError:
+        # Tracing must never break a chat turn
+        pass
+
+
+def summarize(path=None):
+    """Returns {stage: {"count", "p50", "p95"}} in ms from the JSONL file."""
+    durations = {}
+    with open(path or TRACE_FILE, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            attrs = json.loads(line)["attributes"]
+            durations.setdefault(attrs["guru.stage"], []).append(attrs["guru.duration_ms"])
+
+    def pct(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+    return {
+        stage: {"count": len(v), "p50": pct(v, 0.50), "p95": pct(v, 0.95)}
+        for stage, v in sorted(durations.items())
+    }
+
+
+# --- UI ---
+
+def render_waterfall(trace_or_spans, started=None):
+    """Draws a collapsible timing waterfall for one assistant message."""
+    if isinstance(trace_or_spans, Trace):
+        spans, started = trace_or_spans.spans, trace_or_spans.started
+    else:
+        spans = trace_or_spans
+    if not spans:
+        return
+
+    spans = sorted(spans, key=lambda s: s["start"])
+    started = started or spans[0]["start"]
+    total = max(max(s["end"] for s in spans) - started, 1e-6)
+
+    depth = {}
+    for s in spans:
+        depth[s["span_id"]] = depth.get(s["parent_id"], -1) + 1
+
+    with st.expander(f"⏱️ Timing ({total * 1000:.0f} ms)", expanded=False):
+        lines = []
+        for s in spans:
+            offset = int(30 * (s["start"] - started) / total)
+            width = max(1, int(30 * (s["end"] - s["start"]) / total))
+            label = "  " * depth[s["span_id"]] + f"{s['stage']}:{s['name']}"
+            extra = ", ".join(f"{k}={v}" for k, v in s["attrs"].items() if k != "error")
+            lines.append(f"{label:<34} {' ' * offset}{'█' * width:<31} {s['duration_ms']:>8.1f} ms  {extra}")
+        st.code("\n".join(lines), language=None)
+
+
+if __name__ == "__main__":
+    for stage, stats in summarize(sys.argv[1] if len(sys.argv) > 1 else None).items():
+        print(f"{stage:<10} n={stats['count']:<6} p50={stats['p50']:>9.1f} ms  p95={stats['p95']:>9.1f} ms")
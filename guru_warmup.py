@@ -0,0 +1,44 @@
+import importlib
+import threading
+import time
+
+# --- BACKGROUND PRE-WARM ---
+# The analytics and agent stacks take several seconds to import. The login
+# screen does not need them, so they are loaded on a background thread once
+# the form is on screen; by the time the user has signed in they are cached.
+HEAVY_MODULES = [
+    "guru_engine",
+    "langchain_core.messages",
+    "langchain_groq",
+    "langchain_community.tools.tavily_search",
+    "langgraph.graph",
+    "langgraph.prebuilt",
+    "seaborn",
+    "sklearn.ensemble",
+    "statsmodels.tsa.holtwinters",
+]
+
+_started = False
+_lock = threading.Lock()
+timings = {}
+
+
+def _warm():
+    for name in HEAVY_MODULES:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # The real import on first use will surface the error
+            continue
+        timings[name] = (time.perf_counter() - t0) * 1000
+
+
+def start_prewarm():
+    """Starts the pre-warm thread once per worker process."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_warm, name="guru-prewarm", daemon=True).start()
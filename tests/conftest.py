@@ -0,0 +1,18 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import pytest
+from stand_ins import install
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """
+    Dummy secrets, scripted LLM, fake search and SQLite chat history for one test.
+    Import secret-reading modules (guru_brain, guru_hedge, guru_cache) after requesting it.
+    """
+    return install({}, monkeypatch=monkeypatch)
@@ -0,0 +1,26 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from run_benchmarks import run_suite, check_thresholds
+
+
+def test_benchmark_smoke(tmp_path, monkeypatch):
+    """The offline harness runs every scenario without network access."""
+    monkeypatch.chdir(tmp_path)
+    rows = run_suite(sizes=[1_000], wide_cols=20, turns=2, session_rows=1_000, monkeypatch=monkeypatch)
+    keys = {r["key"] for r in rows}
+
+    assert "dataset-1000/parse" in keys
+    assert "dataset-1000/turn.tool" in keys
+    assert "wide-1000x20/turn" in keys
+    assert "session-2/pdf" in keys
+    assert (tmp_path / "report_bench-Session-long.pdf").exists()
+
+
+def test_threshold_check_flags_regressions():
+    rows = [{"key": "dataset-1000/parse", "p95_ms": 900.0, "peak_mb": 1.0}]
+    failures = check_thresholds(rows, {"dataset-1000/parse": {"p95_ms": 250, "peak_mb": 5}})
+    assert failures == ["dataset-1000/parse: p95_ms=900.0 exceeds 250"]
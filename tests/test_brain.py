@@ -0,0 +1,80 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import time
+import pytest
+from langchain_core.tools import StructuredTool
+from stand_ins import fake_search_results
+from langchain_core.messages import HumanMessage
+
+
+@pytest.fixture
+def brain(offline):
+    import guru_brain
+    return guru_brain
+
+
+@pytest.fixture
+def python_tool():
+    runs = []
+
+    def python_analysis(code: str):
+        runs.append(code)
+        if "boom" in code:
+            raise ValueError("boom")
+        return f"ran {code}"
+
+    tool = StructuredTool.from_function(func=python_analysis, name="python_analysis", description="run code")
+    return tool, runs
+
+
+def call(name, args, call_id):
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+def test_identical_python_calls_run_once(brain, python_tool):
+    """Duplicated python_analysis calls are deduped but every call gets a reply."""
+    python_tool, runs = python_tool
+    calls = [call("python_analysis", {"code": "print(1)"}, "a"), call("python_analysis", {"code": "print(1)"}, "b")]
+    messages = brain.execute_tool_calls(calls, [python_tool])
+
+    assert runs == ["print(1)"]
+    assert [m.tool_call_id for m in messages] == ["a", "b"]
+    assert messages[0].content == messages[1].content == "ran print(1)"
+
+
+def test_read_only_tools_run_concurrently_and_keep_order(brain, python_tool):
+    """Searches overlap with each other while results stay in call order."""
+    python_tool, _ = python_tool
+    search = fake_search_results(latency=0.3)
+    calls = [
+        call("tavily_search_results_json", {"query": "one"}, "s1"),
+        call("python_analysis", {"code": "print(2)"}, "p1"),
+        call("tavily_search_results_json", {"query": "two"}, "s2"),
+    ]
+
+    t0 = time.perf_counter()
+    messages = brain.execute_tool_calls(calls, [search, python_tool])
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 0.55
+    assert [m.tool_call_id for m in messages] == ["s1", "p1", "s2"]
+    assert "one" in messages[0].content and "two" in messages[2].content
+
+
+def test_tool_errors_become_error_messages(brain, python_tool):
+    python_tool, _ = python_tool
+    messages = brain.execute_tool_calls([call("python_analysis", {"code": "boom"}, "x")], [python_tool])
+    assert messages[0].status == "error"
+    assert "boom" in messages[0].content
+
+
+def test_router_fast_paths_answer_without_the_graph(brain):
+    """Chat and search turns are answered by one tool-less model call."""
+    messages = [HumanMessage(content="latest news on Groq")]
+    assert "latest news on Groq" in brain.fast_answer(messages).content
+    assert "latest news on Groq" in brain.search_answer(messages, "latest news on Groq").content
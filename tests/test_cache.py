@@ -0,0 +1,84 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import pytest
+
+COLUMNS = ["region", "revenue", "profit"]
+
+
+@pytest.fixture
+def guru_cache(offline):
+    import guru_cache
+    return guru_cache
+
+
+@pytest.fixture
+def cache(guru_cache):
+    return guru_cache.AnswerCache(guru_cache.HashingEmbedder())
+
+
+def cache_scope(username, digest):
+    import guru_cache
+    return guru_cache.cache_scope(username, digest)
+
+
+def test_rephrased_question_hits_within_scope(cache):
+    scope = cache_scope("alice", "digest-a")
+    cache.store(scope, "top 5 regions by revenue", "North leads.", [b"png"], COLUMNS)
+
+    hit, similarity = cache.lookup(scope, "Top 5 regions by revenue?", COLUMNS)
+    assert hit is not None and hit.answer == "North leads."
+    assert hit.charts == [b"png"]
+    assert similarity >= cache.threshold
+
+    # A different dataset never shares answers
+    assert cache.lookup(cache_scope("alice", "digest-b"), "top 5 regions by revenue", COLUMNS)[0] is None
+
+
+def test_different_numbers_or_columns_never_hit(cache):
+    scope = cache_scope("alice", "digest-a")
+    cache.store(scope, "top 5 regions by revenue", "North leads.", columns=COLUMNS)
+
+    assert cache.lookup(scope, "top 10 regions by revenue", COLUMNS)[0] is None
+    assert cache.lookup(scope, "top 5 regions by profit", COLUMNS)[0] is None
+
+
+def test_entries_expire_after_ttl(guru_cache):
+    cache = guru_cache.AnswerCache(guru_cache.HashingEmbedder(), ttl=0.05)
+    scope = cache_scope("alice", "digest-a")
+    cache.store(scope, "average revenue per region", "42")
+    time.sleep(0.1)
+    assert cache.lookup(scope, "average revenue per region")[0] is None
+
+
+def test_follow_ups_and_default_embedder(guru_cache):
+    """Context-dependent prompts bypass the cache; the default embedder needs no model download."""
+    assert guru_cache.depends_on_context("now plot it", has_history=True)
+    assert guru_cache.depends_on_context("what about profit", has_history=True)
+    assert not guru_cache.depends_on_context("top 5 regions by revenue", has_history=True)
+    assert not guru_cache.depends_on_context("now plot it", has_history=False)
+    assert isinstance(guru_cache.make_embedder(), guru_cache.HashingEmbedder)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("which region had the highest revenue?", "which region had the lowest revenue?"),
+    ("sort regions by revenue ascending", "sort regions by revenue descending"),
+    ("show revenue by region as a bar chart", "show revenue by region as a line chart"),
+    ("count rows where revenue > 100", "count rows where revenue < 100"),
+    ("count rows where revenue >= 100", "count rows where revenue > 100"),
+    ("top 5 regions by revenue", "bottom 5 regions by revenue"),
+])
+def test_opposite_questions_never_hit(cache, stored, asked):
+    scope = cache_scope("alice", "digest-a")
+    cache.store(scope, stored, "cached", columns=COLUMNS)
+    assert cache.lookup(scope, asked, COLUMNS)[0] is None
+    assert cache.lookup(scope, stored, COLUMNS)[0] is not None
+
+
+def test_answers_are_private_by_default(guru_cache):
+    assert guru_cache.ANSWER_CACHE_SCOPE == "user"
+    assert cache_scope("alice", "digest-a") != cache_scope("bob", "digest-a")
@@ -7,7 +7,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
 from io import BytesIO
-from nexus_engine import DataEngine
+from guru_engine import DataEngine
 
 # Fixture to initialize the engine before each test
 @pytest.fixture
@@ -35,3 +35,125 @@ def test_load_csv(engine):
     assert engine.df is not None
     assert len(engine.df) == 3
     assert "col1" in engine.df.columns
+
+def test_large_output_is_compacted(engine):
+    """A stray print of a big table is shortened and kept as an artifact."""
+    csv_content = b"a,b\n" + b"\n".join(f"{i},{i * 2}".encode() for i in range(5000))
+    dummy_file = BytesIO(csv_content)
+    dummy_file.name = "big.csv"
+    engine.load_file(dummy_file)
+
+    result = engine.run_python_analysis("print(df.to_string())")
+
+    assert "table: 5000 rows" in result
+    assert "out-1" in result
+    assert len(result) < 2000 * 4
+    artifact = engine.artifacts_since(0)[0]
+    assert "4999" in artifact["output"]
+    assert artifact["tokens_after"] < artifact["tokens_before"]
+
+
+def test_small_output_is_untouched(engine):
+    result = engine.run_python_analysis("print('hello')")
+    assert "hello" in result
+    assert engine.artifacts_since(0) == []
+
+
+def test_excel_sheets_load_lazily(engine):
+    """Only the first sheet is parsed up front; others load on first access."""
+    from openpyxl import Workbook
+    from guru_store import get_dataset_store
+
+    workbook = Workbook()
+    first = workbook.active
+    first.title = "Sales"
+    first.append(["region", "revenue"])
+    first.append(["North", 10])
+    second = workbook.create_sheet("Costs")
+    second.append(["region", "cost"])
+    second.append(["North", 4])
+    second.append(["South", 6])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    dummy_file = BytesIO(buffer.getvalue())
+    dummy_file.name = "book.xlsx"
+
+    status = engine.load_file(dummy_file)
+
+    assert "Sheets: Sales, Costs" in status
+    assert list(engine.df.columns) == ["region", "revenue"]
+    assert engine.sheets.loaded() == ["Sales"]
+
+    result = engine.run_python_analysis("print(sheets['Costs']['cost'].sum())")
+    assert "10" in result
+    assert engine.sheets.loaded() == ["Sales", "Costs"]
+    assert f"{engine.dataset_digest}:Costs" in get_dataset_store()._frames
+
+def test_excel_sheet_matches_pandas_and_shares_bytes():
+    """Duplicate headers are renamed, blank rows kept, and sessions share one copy of the file."""
+    from openpyxl import Workbook
+    import pandas as pd
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["amount", "amount", "note"])
+    sheet.append([1, 2, "a"])
+    sheet.append([None, None, None])
+    sheet.append([3, 4, "b"])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    raw = buffer.getvalue()
+
+    engines = []
+    for _ in range(2):
+        upload = BytesIO(raw)
+        upload.name = "dupes.xlsx"
+        engines.append(DataEngine())
+        engines[-1].load_file(upload)
+
+    expected = pd.read_excel(BytesIO(raw))
+    assert list(engines[0].df.columns) == ["amount", "amount.1", "note"]
+    assert engines[0].df.equals(expected)
+    assert engines[0].sheets._raw_bytes is engines[1].sheets._raw_bytes
+
+def test_in_place_edits_mark_df_as_modified(engine):
+    """Answer caching keys on content: an in-place edit keeps the object but changes the data."""
+    dummy_file = BytesIO(b"col1,col2\n1,10\n2,20")
+    dummy_file.name = "edit.csv"
+    engine.load_file(dummy_file)
+    assert engine.working_df_is_upload()
+
+    engine.run_python_analysis("df.loc[0, 'col1'] = 99\nprint(df.shape)")
+    assert engine.scope["df"] is engine.df
+    assert not engine.working_df_is_upload()
+
+def test_csv_named_like_excel_loads_as_csv(engine):
+    upload = BytesIO(b"a,b\n1,2")
+    upload.name = "xls_export.csv"
+    assert "Data Loaded" in engine.load_file(upload)
+    assert engine.sheets is None
+
+def test_failed_upload_keeps_the_previous_dataset(engine):
+    """A bad upload neither leaks the old store reference nor gets re-parsed on rerun."""
+    from guru_store import get_dataset_store, content_hash
+
+    def upload(content, name, file_id):
+        f = BytesIO(content)
+        f.name, f.file_id = name, file_id
+        return f
+
+    one, two = b"k,v\nfailed-upload-1,1", b"k,v\nfailed-upload-2,2"
+    engine.load_file(upload(one, "one.csv", "f1"))
+    bad = upload(b"\x00not a workbook", "bad.xlsx", "f2")
+    assert "Error" in engine.load_file(bad)
+    assert engine.df.iloc[0, 0] == "failed-upload-1"
+    assert len(engine._dataset_releases) == 1
+
+    bad.getvalue = lambda: pytest.fail("re-parsed the same bad upload")
+    assert "Error" in engine.load_file(bad)
+
+    engine.load_file(upload(two, "two.csv", "f3"))
+    store = get_dataset_store()
+    assert store.peek(content_hash(one)) is None
+    assert store.peek(content_hash(two)) is not None
+    assert len(engine._dataset_releases) == 1
@@ -0,0 +1,89 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from io import BytesIO
+import matplotlib.pyplot as plt
+import guru_governor
+import guru_snapshot
+from guru_engine import DataEngine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(guru_snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(guru_governor, "SESSION_MEMORY_BUDGET", 1_500_000)
+    engine = DataEngine()
+    upload = BytesIO(b"a,b\n1,2\n3,4")
+    upload.name = "small.csv"
+    engine.load_file(upload)
+    return engine
+
+
+def test_least_recently_used_variable_is_spilled(engine):
+    """The older big array goes to disk first and comes back when code uses it."""
+    engine.session_id = "carol-Session-1"
+    engine.run_python_analysis("old = np.ones(100_000)\nprint('old')")
+    engine.run_python_analysis("new = np.ones(100_000)\nprint('new')")
+
+    assert "old" not in engine.scope
+    assert "new" in engine.scope
+    assert any("spilled old" in a for a in engine.memory_report.actions)
+    assert engine.memory_report.level != "over"
+
+    output = engine.run_python_analysis("print(old.sum())")
+    assert "100000.0" in output
+
+
+def test_without_session_variables_are_evicted(engine):
+    engine.run_python_analysis("big = np.ones(300_000)\nprint('big')")
+
+    assert "big" not in engine.scope
+    assert engine.memory_report.actions == ["evicted big"]
+    assert "df" in engine.scope
+
+
+def test_stale_figures_are_closed(engine):
+    plt.close("all")
+    code = "for i in range(6):\n    plt.figure()\nplt.plot([1, 2])\nprint('done')"
+    output = engine.run_python_analysis(code)
+
+    assert "[CHART GENERATED]" in output
+    assert plt.get_fignums() == [engine.latest_figure.number]
+    assert engine.memory_report.figures == 1
+
+
+def test_shared_datasets_only_warn(engine, monkeypatch):
+    """Worker pressure from shared datasets never makes a session spill its own variables."""
+    monkeypatch.setattr(guru_governor, "SESSION_MEMORY_BUDGET", 10**9)
+    monkeypatch.setattr(guru_governor, "PROCESS_MEMORY_BUDGET", 10**9)
+    store = guru_governor.get_dataset_store()
+    monkeypatch.setattr(store, "stats", lambda: (1, 1, 10**9))
+
+    engine.run_python_analysis("keep = np.ones(1000)\nprint('ok')")
+
+    assert "keep" in engine.scope
+    assert engine.memory_report.actions == []
+    assert engine.memory_report.level == "warn"
+
+
+def test_failed_spill_falls_back_to_eviction(engine, monkeypatch):
+    """A full disk or unwritable snapshot folder never turns the analysis into a tool error."""
+    def disk_full(*args):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(guru_governor, "spill_variables", disk_full)
+    engine.session_id = "judy-Session-1"
+
+    output = engine.run_python_analysis("big = np.ones(300_000)\nprint('computed')")
+
+    assert "computed" in output and "[ANALYSIS COMPLETE]" in output
+    assert "big" not in engine.scope
+    assert engine.memory_report.actions == ["could not spill to disk (No space left on device)", "evicted big"]
+
+
+def test_governor_errors_keep_the_result(engine, monkeypatch):
+    monkeypatch.setattr(engine.governor, "enforce", lambda *a: 1 / 0)
+    assert "[ANALYSIS COMPLETE]" in engine.run_python_analysis("print('still here')")
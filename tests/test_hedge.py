@@ -0,0 +1,94 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import time
+import pytest
+from langchain_core.messages import HumanMessage
+from stand_ins import ScriptedChatModel
+
+
+@pytest.fixture
+def modules(offline):
+    import guru_brain
+    import guru_hedge
+    return guru_brain, guru_hedge
+
+
+@pytest.fixture
+def policy(modules, monkeypatch):
+    guru_brain, guru_hedge = modules
+    policy = guru_hedge.HedgePolicy()
+    monkeypatch.setattr(guru_hedge, "HEDGE_DEADLINE", 0.1)
+    monkeypatch.setattr(guru_brain, "get_hedge_policy", lambda: policy)
+    guru_brain.init_keys()
+    return policy
+
+
+def use_latency(monkeypatch, latency):
+    import guru_brain
+    monkeypatch.setattr(guru_brain, "ChatGroq", lambda **kw: ScriptedChatModel({}, latency=latency, **kw))
+
+
+def test_deadline_adapts_to_latency_history(modules):
+    _, guru_hedge = modules
+    policy = guru_hedge.HedgePolicy()
+    assert policy.deadline("m") == guru_hedge.HEDGE_DEADLINE
+    for i in range(100):
+        policy.record_latency("m", 2.0 + i / 100)
+    assert 2.9 <= policy.deadline("m") <= 3.0
+
+
+def test_slow_primary_is_hedged_and_fallback_wins(modules, policy, monkeypatch):
+    guru_brain, _ = modules
+    use_latency(monkeypatch, {guru_brain.MODEL_SMART: 1.0, guru_brain.MODEL_FAST: 0.05})
+
+    t0 = time.perf_counter()
+    response = guru_brain.hedged_invoke([], [HumanMessage(content="hello")])
+
+    assert time.perf_counter() - t0 < 0.6
+    assert "hello" in response.content
+    assert policy.stats["hedges"] == 1
+    assert policy.stats["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged(modules, policy, monkeypatch):
+    guru_brain, _ = modules
+    use_latency(monkeypatch, {guru_brain.MODEL_SMART: 0.0, guru_brain.MODEL_FAST: 0.0})
+
+    guru_brain.hedged_invoke([], [HumanMessage(content="hello")])
+
+    assert policy.stats["hedges"] == 0
+
+
+def test_losing_call_has_its_connection_closed(modules, policy, monkeypatch):
+    """Cancelling the slow primary closes its HTTP client instead of waiting for the next chunk."""
+    guru_brain, _ = modules
+    clients = {}
+
+    def chat_model(**kw):
+        clients[kw["model"]] = kw["http_client"]
+        latency = {guru_brain.MODEL_SMART: 1.0, guru_brain.MODEL_FAST: 0.05}
+        return ScriptedChatModel({}, latency=latency, **kw)
+
+    monkeypatch.setattr(guru_brain, "ChatGroq", chat_model)
+    guru_brain.hedged_invoke([], [HumanMessage(content="hello")])
+
+    assert clients[guru_brain.MODEL_SMART].is_closed
+
+
+def test_no_hedge_without_a_free_slot(modules, policy, monkeypatch):
+    """A busy hedge pool means waiting on the primary, not queueing more load."""
+    guru_brain, _ = modules
+    import threading
+    monkeypatch.setattr(guru_brain, "_hedge_slots", threading.BoundedSemaphore(1))
+    guru_brain._hedge_slots.acquire()
+    use_latency(monkeypatch, {guru_brain.MODEL_SMART: 0.3, guru_brain.MODEL_FAST: 0.0})
+
+    response = guru_brain.hedged_invoke([], [HumanMessage(content="hello")])
+
+    assert "hello" in response.content
+    assert policy.stats["hedges"] == 0
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from guru_router import classify_prompt, RouteStats, ROUTE_CHAT, ROUTE_SEARCH, ROUTE_DATA
+
+
+@pytest.mark.parametrize("prompt, has_data, expected", [
+    ("thanks!", True, ROUTE_CHAT),
+    ("Hello", False, ROUTE_CHAT),
+    ("What is a p-value?", True, ROUTE_CHAT),
+    ("latest news on Groq", False, ROUTE_SEARCH),
+    ("top 5 regions by revenue", True, ROUTE_DATA),
+    ("rename the chart title to Sales", True, ROUTE_DATA),
+    ("which region had most Revenue?", True, ROUTE_DATA),
+    ("walk me through how you would segment these customers for a campaign", True, ROUTE_DATA),
+])
+def test_heuristic_routes(prompt, has_data, expected):
+    assert classify_prompt(prompt, has_data, columns=["region", "revenue"]).route == expected
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("what are the best selling products?", ROUTE_DATA),
+    ("what is the busiest month?", ROUTE_DATA),
+    ("explain the sales drop in March", ROUTE_DATA),
+    ("how many orders came in today?", ROUTE_DATA),
+    ("which products sold most this week?", ROUTE_DATA),
+    ("what were our latest orders?", ROUTE_DATA),
+    ("What is a p-value?", ROUTE_CHAT),
+    ("explain gradient boosting", ROUTE_CHAT),
+    ("latest news on Groq", ROUTE_SEARCH),
+    ("what's the weather today?", ROUTE_SEARCH),
+])
+def test_questions_about_loaded_data_get_tools(prompt, expected):
+    columns = ["order_date", "region", "product_name", "units", "revenue"]
+    assert classify_prompt(prompt, True, columns=columns).route == expected
+
+
+def test_classifier_used_only_when_confident():
+    prompt = "tell me something interesting about these customers please"
+    assert classify_prompt(prompt, True, classifier=lambda p: (ROUTE_CHAT, 0.9)).route == ROUTE_CHAT
+    assert classify_prompt(prompt, True, classifier=lambda p: (ROUTE_CHAT, 0.4)).route == ROUTE_DATA
+
+
+def test_savings_estimated_against_full_graph_turns():
+    stats = RouteStats()
+    assert stats.estimated_savings(ROUTE_CHAT, 500) == 0.0
+    stats.record(ROUTE_DATA, 4000)
+    stats.record(ROUTE_DATA, 6000)
+    assert stats.estimated_savings(ROUTE_CHAT, 1000) == 4000
+    assert stats.estimated_savings(ROUTE_DATA, 1000) == 0.0
+
+
+@pytest.mark.parametrize("previous_reply, has_data, expected", [
+    ("Revenue peaked in March. Shall I plot it?", True, ROUTE_DATA),
+    ("I can also break this down by region if you want.", True, ROUTE_DATA),
+    ("Revenue peaked in March.", True, ROUTE_CHAT),
+    ("Shall I plot it?", False, ROUTE_CHAT),
+])
+def test_acknowledgement_after_an_offer(previous_reply, has_data, expected):
+    """A bare "ok" accepts the assistant's offer only when there is data to act on."""
+    assert classify_prompt("ok", has_data, previous_reply=previous_reply).route == expected
@@ -0,0 +1,167 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from io import BytesIO
+import guru_snapshot
+from guru_engine import DataEngine
+from guru_store import get_dataset_store
+from guru_snapshot import snapshot_engine, restore_engine, delete_snapshot
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(guru_snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def loaded_engine():
+    engine = DataEngine()
+    upload = BytesIO(b"city,sales\nPune,10\nDelhi,20\nPune,30")
+    upload.name = "sales.csv"
+    engine.load_file(upload)
+    return engine
+
+
+def test_restore_is_lazy_and_complete():
+    """Variables come back only when code uses them; the upload stays separate from a reassigned df."""
+    engine = loaded_engine()
+    engine.run_python_analysis("totals = df.groupby('city')['sales'].sum()\ndf = df[df.sales > 10]\nprint(len(df))")
+    snapshot_engine(engine, "alice-Session-1")
+
+    restored = DataEngine()
+    names = restore_engine(restored, "alice-Session-1")
+
+    assert sorted(names) == ["df", "totals"]
+    assert restored.has_data()
+    assert "totals" not in restored.scope
+    assert restored.column_str == "city, sales"
+
+    output = restored.run_python_analysis("print(totals['Pune'], len(df))")
+    assert "40 2" in output
+    assert len(restored.df) == 3  # the original upload
+
+
+def test_snapshot_only_writes_changes(snapshot_dir):
+    engine = loaded_engine()
+    engine.run_python_analysis("rows = len(df)\nprint(rows)")
+    assert snapshot_engine(engine, "bob-Session-1") == 3  # __upload__, df (alias of it), rows
+
+    assert snapshot_engine(engine, "bob-Session-1") == 0
+
+    engine.run_python_analysis("rows = rows + 1\nprint(rows)")
+    assert snapshot_engine(engine, "bob-Session-1") == 1
+
+    # Untouched restored variables survive the next snapshot
+    restored = DataEngine()
+    restore_engine(restored, "bob-Session-1")
+    restored.run_python_analysis("note = 'checked'\nprint(note)")
+    snapshot_engine(restored, "bob-Session-1")
+    assert sorted(restore_engine(DataEngine(), "bob-Session-1")) == ["df", "note", "rows"]
+
+    delete_snapshot("bob-Session-1")
+    assert restore_engine(DataEngine(), "bob-Session-1") == []
+
+
+def test_restored_edits_never_reach_the_shared_store():
+    """In-place edits are restored privately; the next upload of the same file gets the original."""
+    alice = loaded_engine()
+    alice.run_python_analysis("df['secret'] = 1\nprint(df.shape)")
+    snapshot_engine(alice, "alice-Session-2")
+    digest = alice.dataset_digest
+    del alice  # worker restart: nobody holds the dataset any more
+    assert get_dataset_store().peek(digest) is None
+
+    restored = DataEngine()
+    restore_engine(restored, "alice-Session-2")
+    assert "secret" in restored.run_python_analysis("print(list(df.columns))")
+    assert list(restored.df.columns) == ["city", "sales"]
+
+    bob = loaded_engine()
+    assert bob.df.shape == (3, 2)
+    assert "secret" not in bob.df.columns
+
+
+def test_snapshot_refuses_another_session():
+    engine = loaded_engine()
+    engine.session_id = "alice-Session-3"
+    with pytest.raises(ValueError):
+        snapshot_engine(engine, "alice-Session-4")
+
+
+def test_unchanged_upload_is_not_rehashed(monkeypatch):
+    """The shared upload is fingerprinted by its store key instead of hashing every row."""
+    engine = loaded_engine()
+    hashed = []
+    monkeypatch.setattr(guru_snapshot, "_fingerprint", lambda v: hashed.append(v) or ("x", None))
+    engine.run_python_analysis("print(len(df))")
+    snapshot_engine(engine, "dave-Session-1")
+    assert hashed == []
+
+
+def test_restored_workbook_gets_its_sheets_back():
+    """Re-offering the restored workbook keeps the restored state and brings back `sheets`."""
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.active.title = "Sales"
+    workbook.active.append(["region", "revenue"])
+    workbook.active.append(["North", 10])
+    costs = workbook.create_sheet("Costs")
+    costs.append(["region", "cost"])
+    costs.append(["North", 4])
+    buffer = BytesIO()
+    workbook.save(buffer)
+
+    def upload():
+        f = BytesIO(buffer.getvalue())
+        f.name, f.file_id = "book.xlsx", "wb-1"
+        return f
+
+    engine = DataEngine()
+    engine.load_file(upload())
+    engine.run_python_analysis("total = df['revenue'].sum()\nprint(total)")
+    snapshot_engine(engine, "erin-Session-1")
+
+    restored = DataEngine()
+    restore_engine(restored, "erin-Session-1")
+    assert "Restored" in restored.load_file(upload())
+    assert list(restored.sheets) == ["Sales", "Costs"]
+    assert "4" in restored.run_python_analysis("print(sheets['Costs']['cost'].sum(), total)")
+
+
+def test_sessions_do_not_wait_for_each_other():
+    """A slow write queued for one session does not block restores or deletes of another."""
+    import threading
+    release = threading.Event()
+    slow = guru_snapshot._enqueue("frank-Session-1", release.wait)
+    try:
+        engine = loaded_engine()
+        engine.run_python_analysis("rows = len(df)\nprint(rows)")
+        snapshot_engine(engine, "grace-Session-1")
+        assert "rows" in restore_engine(DataEngine(), "grace-Session-1")
+        delete_snapshot("grace-Session-1")
+        assert not slow.done()
+    finally:
+        release.set()
+    assert slow.result(timeout=5)
+
+
+def test_series_and_arrays_are_serialized_off_thread():
+    """Series and arrays are captured as copies and pickled on the worker, not the request thread."""
+    engine = loaded_engine()
+    engine.run_python_analysis("import numpy as np\ns = df['sales'] * 2\narr = np.arange(5)\nprint(len(s))")
+    items = guru_snapshot._capture(engine)
+    assert items["s"][0] == items["arr"][0] == "value"
+
+    engine.scope["arr"][0] = 99  # edits after capture never reach the snapshot
+    engine.run_python_analysis("s.iloc[0] = -1\nprint(s.iloc[0])")
+    assert items["arr"][1][0] == 0 and items["s"][1].iloc[0] == 20
+
+    snapshot_engine(engine, "heidi-Session-1")
+    restored = DataEngine()
+    restore_engine(restored, "heidi-Session-1")
+    assert "99 -1" in restored.run_python_analysis("print(arr[0], s.iloc[0])")
@@ -0,0 +1,84 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import pandas as pd
+from guru_store import DatasetStore, content_hash
+
+
+@pytest.fixture
+def store():
+    return DatasetStore()
+
+
+def test_identical_uploads_share_one_frame(store):
+    """The loader only runs once per content hash."""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return pd.DataFrame({"a": [1, 2, 3]})
+
+    digest = content_hash(b"a\n1\n2\n3")
+    first = store.acquire(digest, loader)
+    second = store.acquire(digest, loader)
+
+    assert len(calls) == 1
+    assert first.equals(second)
+    assert store.stats()[:2] == (1, 2)
+
+
+def test_mutation_does_not_leak_to_other_sessions(store):
+    """Copy-on-write keeps the shared frame untouched."""
+    digest = content_hash(b"shared")
+    first = store.acquire(digest, lambda: pd.DataFrame({"a": [1, 2, 3]}))
+    second = store.acquire(digest, lambda: None)
+
+    first["a"] = first["a"] * 10
+    first.loc[0, "a"] = -1
+
+    assert second["a"].tolist() == [1, 2, 3]
+
+
+def test_release_frees_unused_dataset(store):
+    """The dataset is dropped once the last reference is released."""
+    digest = content_hash(b"temp")
+    store.acquire(digest, lambda: pd.DataFrame({"a": [1]}))
+    store.acquire(digest, lambda: None)
+
+    store.release(digest)
+    assert store.stats()[0] == 1
+    store.release(digest)
+    assert store.stats()[0] == 0
+
+
+def test_parse_runs_outside_the_lock(store):
+    """Other sessions can use the store while a dataset is parsed; concurrent loads parse once."""
+    import threading
+    calls, started, finish = [], threading.Event(), threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        started.set()
+        finish.wait(5)
+        return pd.DataFrame({"a": [1]})
+
+    digest = content_hash(b"slow")
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(store.acquire(digest, slow_loader))) for _ in range(2)]
+    for w in workers:
+        w.start()
+    started.wait(5)
+
+    # Would block behind the parse if the loader held the lock
+    assert store.stats()[0] == 0
+    finish.set()
+    for w in workers:
+        w.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 2
+    assert store.stats()[:2] == (1, 2)
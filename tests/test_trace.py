@@ -0,0 +1,42 @@
+import sys
+import os
+
+# --- PATH FIX ---
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import guru_trace
+from guru_trace import start_trace, span, traced, summarize
+
+
+def test_spans_nest_and_export(tmp_path, monkeypatch):
+    """Nested spans keep their parent and land in the JSONL file."""
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(guru_trace, "TRACE_FILE", str(trace_file))
+
+    @traced("db")
+    def load_history():
+        return []
+
+    with start_trace("alice-Session-1") as trace:
+        with span("llm", "model-a", retries=0) as attrs:
+            attrs["output_tokens"] = 12
+            load_history()
+
+    llm, db = sorted(trace.spans, key=lambda s: s["start"])
+    assert db["parent_id"] == llm["span_id"]
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert len(records) == 2
+    assert {r["attributes"]["guru.stage"] for r in records} == {"llm", "db"}
+    assert all(r["trace_id"] == trace.trace_id for r in records)
+
+    stats = summarize(str(trace_file))
+    assert stats["llm"]["count"] == 1
+
+
+def test_span_without_trace_is_noop():
+    """Instrumented code still runs when no turn is being traced."""
+    with span("tool", "python_analysis") as attrs:
+        attrs["x"] = 1
+    assert attrs == {"x": 1}